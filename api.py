@@ -0,0 +1,263 @@
+"""
+Headless HTTP API for the recommendation engine, next to the Streamlit UI.
+
+    python api.py --port 8000 --workers 4
+
+Models, the drugs catalogue and the doctor search index are loaded once in the
+parent process; the workers are forked from it afterwards, so they all share
+those pages (copy-on-write) instead of loading their own copies. Every worker
+accepts connections from the same listening socket. Without os.fork (Windows)
+the API runs as a single threaded process.
+
+All endpoints take and return JSON. Conditions match the catalogue's
+condition names as case-insensitive substrings ("acne" -> "Acne").
+
+    GET  /health
+    GET  /v1/stats                    p50/p95 per endpoint (this worker)
+    POST /v1/predict                  {"text": "..."}             -> {"condition": ...}
+    POST /v1/predict/batch            {"texts": [...]}            -> {"conditions": [...]}
+    POST /v1/recommend                {"condition": "...", "top_k": 5} -> {"condition", "drugs": [...]}
+    POST /v1/recommend/batch          {"conditions": [...], "top_k": 5} -> {"results": [{"condition", "drugs"}]}
+    POST /v1/doctors/search           {"query": "...", "limit": 20} -> {"doctors": [...]}
+    POST /v1/doctors/search/batch     {"queries": [...], "limit": 20} -> {"results": [{"query", "doctors"}]}
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules import model, predictor, condition_matcher, doctor_manager, telemetry
+
+DRUGS_FILE = "drugs.csv"
+MAX_BATCH = 1000          # Items per batch request
+MAX_BODY = 4 * 2**20      # Bytes per request body
+MAX_TOP_K = 100
+DEFAULT_LIMIT = 20        # Doctors per search result
+DRUG_FIELDS = ["drug_name", "generic_name", "drug_classes", "medical_condition",
+               "rating", "no_of_reviews", "side_effects", "trust_score"]
+DOCTOR_FIELDS = ["username", "specialty", "status"]
+
+class ApiError(Exception):
+    """Answered with the given HTTP status and message."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# -----------------------------------------------------------------------------
+# 1. SHARED STATE (loaded before forking)
+# -----------------------------------------------------------------------------
+def load_shared():
+    """Loads everything the endpoints need. Returns False if the predictor models are missing."""
+    drugs = model.load_data(DRUGS_FILE) # Also builds the recommendation index
+    doctor_manager.get_all_doctors("warm up") # Builds the doctor search index
+    keywords = condition_matcher.load() # Condition-name automaton in front of the SVM
+    ready = predictor.warm_up()
+    print(f"📦 {len(drugs):,} drugs, {keywords['patterns']:,} condition keywords, "
+          f"{len(doctor_manager.get_all_doctors()):,} doctors, "
+          f"models {'loaded' if ready else 'missing (predictions fall back to General)'}")
+    return ready
+
+def _records(frame, fields):
+    """JSON-ready rows (missing values as null)."""
+    columns = [c for c in fields if c in frame.columns]
+    rows = zip(*(frame[c].tolist() for c in columns))
+    return [{c: None if v != v else v for c, v in zip(columns, row)} for row in rows] # NaN != NaN
+
+# -----------------------------------------------------------------------------
+# 2. ENDPOINTS
+# -----------------------------------------------------------------------------
+ROUTES = {} # (method, path) -> function(payload) -> response dict
+
+def route(method, path):
+    def register(func):
+        ROUTES[(method, path)] = func
+        return func
+    return register
+
+def _field(payload, name, kind, default=None):
+    value = payload.get(name, default)
+    if value is None or not isinstance(value, kind) or isinstance(value, bool):
+        raise ApiError(400, f"'{name}' must be a {kind.__name__}")
+    return value
+
+def _batch(payload, name):
+    items = _field(payload, name, list)
+    if len(items) > MAX_BATCH: raise ApiError(413, f"at most {MAX_BATCH} '{name}' per request")
+    if not all(isinstance(item, str) for item in items): raise ApiError(400, f"'{name}' must be strings")
+    return items
+
+def _bounded(payload, name, default, upper):
+    value = _field(payload, name, int, default)
+    if not 1 <= value <= upper: raise ApiError(400, f"'{name}' must be between 1 and {upper}")
+    return value
+
+@route("GET", "/health")
+def health(payload):
+    return {"status": "ok", "worker": os.getpid(), "models": predictor.load_models()}
+
+@route("GET", "/v1/stats")
+def stats(payload):
+    return {"worker": os.getpid(), "timings": telemetry.summary(), "events": telemetry.event_counts()}
+
+@route("POST", "/v1/predict")
+def predict(payload):
+    return {"condition": predictor.predict_condition(_field(payload, "text", str))}
+
+@route("POST", "/v1/predict/batch")
+def predict_batch(payload):
+    return {"conditions": predictor.predict_conditions(_batch(payload, "texts"))}
+
+def _recommend(conditions, top_k):
+    """{condition: drug records} for the distinct conditions (slices of the precomputed ranking)."""
+    df = model.load_data(DRUGS_FILE)
+    # Client text is matched literally (case-insensitive substring), never compiled
+    # as a pattern: no regex errors and no catastrophic backtracking
+    return {condition: _records(model.get_recommendations(re.escape(condition), df, top_k), DRUG_FIELDS)
+            for condition in dict.fromkeys(conditions)}
+
+@route("POST", "/v1/recommend")
+def recommend(payload):
+    condition = _field(payload, "condition", str)
+    drugs = _recommend([condition], _bounded(payload, "top_k", 5, MAX_TOP_K))
+    return {"condition": condition, "drugs": drugs[condition]}
+
+@route("POST", "/v1/recommend/batch")
+def recommend_batch(payload):
+    conditions = _batch(payload, "conditions")
+    drugs = _recommend(conditions, _bounded(payload, "top_k", 5, MAX_TOP_K))
+    return {"results": [{"condition": c, "drugs": drugs[c]} for c in conditions]}
+
+def _search_doctors(query, limit):
+    return _records(doctor_manager.get_all_doctors(query).head(limit), DOCTOR_FIELDS)
+
+@route("POST", "/v1/doctors/search")
+def doctors_search(payload):
+    limit = _bounded(payload, "limit", DEFAULT_LIMIT, MAX_BATCH)
+    return {"doctors": _search_doctors(_field(payload, "query", str), limit)}
+
+@route("POST", "/v1/doctors/search/batch")
+def doctors_search_batch(payload):
+    queries = _batch(payload, "queries")
+    limit = _bounded(payload, "limit", DEFAULT_LIMIT, MAX_BATCH)
+    found = {query: _search_doctors(query, limit) for query in dict.fromkeys(queries)}
+    return {"results": [{"query": q, "doctors": found[q]} for q in queries]}
+
+# -----------------------------------------------------------------------------
+# 3. HTTP SERVER + PRE-FORK WORKER POOL
+# -----------------------------------------------------------------------------
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: bulk clients reuse their connections
+    disable_nagle_algorithm = True # Headers and body are separate writes: don't wait for the ACK
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        func = ROUTES.get((method, path))
+        with telemetry.span(f"api.{func.__name__ if func else 'not_found'}") as attrs:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                if length > MAX_BODY:
+                    self.close_connection = True # Body left unread
+                    raise ApiError(413, "request body too large")
+                body = self.rfile.read(length) if length else b""
+                if func is None: raise ApiError(404, f"no endpoint {method} {path}")
+                try:
+                    payload = json.loads(body) if body else {}
+                except ValueError:
+                    raise ApiError(400, "body is not valid JSON")
+                if not isinstance(payload, dict): raise ApiError(400, "body must be a JSON object")
+                status, response = 200, func(payload)
+            except ApiError as e:
+                status, response = e.status, {"error": str(e)}
+            except Exception as e:
+                print(f"⚠️ API error on {method} {path}: {e}")
+                status, response = 500, {"error": "internal error"}
+            attrs["status"] = status
+            self._send_json(status, response)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def _spawn(server):
+    """Forks one worker serving from the shared listening socket. Returns its pid."""
+    pid = os.fork()
+    if pid: return pid
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+def serve(host="127.0.0.1", port=8000, workers=None):
+    """Loads the shared state, then serves with `workers` processes (default: one per CPU)."""
+    workers = workers or os.cpu_count() or 1
+    server = ApiServer((host, port), ApiHandler)
+    # Idle workers all wake up on a new connection; the ones that lose the
+    # race must not block in accept()
+    server.socket.setblocking(False)
+    load_shared()
+    print(f"🚀 API on http://{host}:{server.server_address[1]}", flush=True)
+
+    if workers == 1 or not hasattr(os, "fork"):
+        print("   1 worker (threaded)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    print(f"   {workers} workers", flush=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    children = {_spawn(server) for _ in range(workers)}
+    try:
+        while True:
+            pid, _ = os.wait()
+            if pid in children: # A worker died: replace it
+                children.discard(pid)
+                children.add(_spawn(server))
+    except (KeyboardInterrupt, SystemExit):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    finally:
+        server.server_close()
+
+def main():
+    global DRUGS_FILE
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--drugs", default=DRUGS_FILE, help="drugs dataset")
+    parser.add_argument("--doctors", default=doctor_manager.DOCTORS_FILE, help="doctors table")
+    args = parser.parse_args()
+
+    DRUGS_FILE = condition_matcher.DRUGS_FILE = args.drugs
+    doctor_manager.DOCTORS_FILE = args.doctors
+    serve(args.host, args.port, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import os
-from modules import auth, model, chatbot, doctor_manager, appointments, predictor
+from modules import auth, model, chatbot, doctor_manager, appointments, predictor, telemetry, chat_history
 
 # -----------------------------------------------------------------------------
 # 1. SETUP & THEME
@@ -74,18 +73,46 @@ st.markdown("""
 
 if 'view' not in st.session_state: st.session_state.view = "AI Chat"
 if 'user' not in st.session_state: st.session_state.user = None
-if 'chat_history' not in st.session_state: st.session_state.chat_history = []
+if 'chat_history' not in st.session_state: st.session_state.chat_history = chat_history.new_history()
+if 'chat_page' not in st.session_state: st.session_state.chat_page = 0
+if 'pending_reply' not in st.session_state: st.session_state.pending_reply = None
+
+# Seconds between checks on a background AI reply (pipeline mode)
+REPLY_POLL_INTERVAL = 0.3
+# Seconds between change-feed polls on the doctor dashboard
+SCHEDULE_POLL_INTERVAL = 5
+# Rows per page in the admin tables
+ADMIN_PAGE_SIZE = 50
+# Chat bubbles drawn per rerun (older kept messages are paged)
+CHAT_PAGE_SIZE = 20
 
 def logout():
     st.session_state.user = None
-    st.session_state.chat_history = []
+    st.session_state.chat_history = chat_history.new_history()
+    st.session_state.chat_page = 0
+    st.session_state.pending_reply = None
+    st.session_state.appt_feed = None
     st.session_state.view = "AI Chat"
     st.rerun()
 
+@st.fragment(run_every=REPLY_POLL_INTERVAL)
+def pending_reply_bubble():
+    """Re-renders only the last bot bubble while its AI reply arrives in the background."""
+    pending = st.session_state.pending_reply
+    if pending is None: return
+    text, final = chatbot.poll_ai_response(pending["job"])
+    st.markdown(f"<div style='overflow:hidden'><div class='bot-bubble'>{text}</div></div>", unsafe_allow_html=True)
+    if final:
+        chat_history.set_content(st.session_state.chat_history, pending["index"], text)
+        st.session_state.pending_reply = None
+        st.rerun()
+    elif not pending["job"]["parts"]:
+        st.caption("⏳ AI assistant is writing a detailed answer...")
+
 # Load Data & Models
 df = model.load_data()
 doctor_manager.init_doctors_db()
-predictor.load_models() 
+predictor.warm_up()
 
 # -----------------------------------------------------------------------------
 # 2. ADMIN DASHBOARD
@@ -98,19 +125,56 @@ def admin_dashboard():
         if st.button("Logout"): logout()
     st.markdown("---")
 
-    users = auth.load_users()
-    docs_df = pd.DataFrame()
-    if os.path.exists("doctors.csv"): docs_df = pd.read_csv("doctors.csv")
+    # Counts come precomputed from the data layer; tables load one page at a time
+    drug_stats = model.catalogue_stats(df)
 
     c1, c2, c3, c4 = st.columns(4)
-    with c1: st.metric("Total Users", len(users))
-    with c2: st.metric("Doctors", len(docs_df))
-    with c3: st.metric("Drugs DB", len(df))
-    with c4: st.metric("Reviews", f"{df['no_of_reviews'].sum():,.0f}")
+    with c1: st.metric("Total Users", auth.user_stats()["users"])
+    with c2: st.metric("Doctors", doctor_manager.doctor_stats()["doctors"])
+    with c3: st.metric("Drugs DB", drug_stats["drugs"])
+    with c4: st.metric("Reviews", f"{drug_stats['reviews']:,.0f}")
+
+    tab1, tab2, tab3 = st.tabs(["Users", "Doctors", "⏱️ Latency"])
+    with tab1: paged_table("users", auth.get_users_page)
+    with tab2: paged_table("doctors", doctor_manager.get_doctors_page)
+    with tab3: latency_panel()
+
+def latency_panel():
+    """p50 / p95 per timed operation, since this server process started."""
+    if not telemetry.ENABLED:
+        st.info("Timing is off (SAMHATI_TIMING=0).")
+        return
+    spans = pd.DataFrame(telemetry.summary())
+    events = telemetry.event_counts() # Fallbacks etc.: counted, no duration
+    if spans.empty and not events:
+        st.info("No timings recorded yet.")
+        return
 
-    tab1, tab2 = st.tabs(["Users", "Doctors"])
-    with tab1: st.dataframe(users, use_container_width=True)
-    with tab2: st.dataframe(docs_df, use_container_width=True)
+    if not spans.empty:
+        fig = px.bar(spans.sort_values('p95_ms'), x=['p50_ms', 'p95_ms'], y='name', orientation='h',
+                     barmode='group', log_x=True, labels={"value": "ms", "name": ""})
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(spans.round(3), use_container_width=True, hide_index=True)
+    if events:
+        st.caption("Events: " + ", ".join(f"{n} × {c}" for n, c in events.items()))
+
+    if st.button("📝 Export recent spans"):
+        count = telemetry.export_jsonl()
+        st.success(f"{count} new spans appended to {telemetry.EXPORT_FILE}")
+
+def paged_table(key, fetch):
+    """Filter box + one page of rows from fetch(page, page_size, query) -> (rows, total)."""
+    c1, c2 = st.columns([4, 1])
+    with c1: query = st.text_input("🔍 Filter", key=f"{key}_filter", placeholder="Type to filter...")
+    with c2: page = st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+
+    rows, total = fetch(page - 1, ADMIN_PAGE_SIZE, query)
+    pages = max(1, -(-total // ADMIN_PAGE_SIZE))
+    if page > pages: # Filter narrowed the result: show its last page
+        page = pages
+        rows, total = fetch(page - 1, ADMIN_PAGE_SIZE, query)
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"{total:,} rows · page {page} of {pages}")
 
 # -----------------------------------------------------------------------------
 # 3. DOCTOR DASHBOARD (Updated: Refresh & Delete)
@@ -143,9 +207,17 @@ def doctor_dashboard():
     st.markdown("---")
     
     # --- 2. APPOINTMENT MANAGEMENT ---
+    schedule_board(doc_name)
+
+@st.fragment(run_every=SCHEDULE_POLL_INTERVAL)
+def schedule_board(doc_name):
+    """Appointment lists; re-polls the change feed on its own every few seconds."""
     st.subheader("📅 Schedule Management")
     
-    appts = appointments.get_doctor_appointments(doc_name)
+    # Only appointments changed since the last poll are fetched (change feed)
+    feed = appointments.sync_doctor_appointments(doc_name, st.session_state.get("appt_feed"))
+    st.session_state.appt_feed = feed
+    appts = feed["frame"]
     
     if not appts.empty:
         pending_appts = appts[appts['status'] == 'Pending']
@@ -156,6 +228,11 @@ def doctor_dashboard():
         # --- PENDING ---
         with tab1:
             if not pending_appts.empty:
+                bulk_actions("pending", pending_appts, [
+                    ("✅ Accept selected", lambda ids: appointments.update_statuses(ids, "Accepted")),
+                    ("❌ Reject selected", lambda ids: appointments.update_statuses(ids, "Rejected")),
+                    ("🗑️ Delete selected", appointments.delete_appointments),
+                ])
                 for index, row in pending_appts.iterrows():
                     with st.container():
                         st.markdown(f"""
@@ -182,6 +259,9 @@ def doctor_dashboard():
         # --- CONFIRMED ---
         with tab2:
             if not confirmed_appts.empty:
+                bulk_actions("confirmed", confirmed_appts, [
+                    ("🗑️ Clear selected", appointments.delete_appointments),
+                ])
                 for index, row in confirmed_appts.iterrows():
                     st.markdown(f"""
                     <div style="background-color: white; padding: 15px; border-left: 5px solid #28a745; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); margin-bottom: 15px;">
@@ -197,6 +277,28 @@ def doctor_dashboard():
     else:
         st.info("No appointment history found.")
 
+def bulk_actions(key, appts, actions):
+    """
+    Multi-select over these appointments + one button per (label, func(ids)).
+    The whole selection goes to func in one call (one DB transaction, one rerun).
+    """
+    # The click reruns with a fresh change feed: act only on what the doctor saw
+    shown = set(st.session_state.get(f"{key}_shown", ()))
+    labels = {int(i): f"#{i} · {p} · {t}" for i, p, t in zip(appts['id'], appts['patient'], appts['timestamp'])}
+    st.session_state[f"{key}_shown"] = list(labels)
+    select_all = st.checkbox(f"Select all ({len(labels)})", key=f"{key}_all")
+    picked = st.multiselect("Select appointments", list(labels), format_func=labels.get, key=f"{key}_pick",
+                            disabled=select_all, placeholder="Pick appointments for a batch action...")
+    ids = list(labels) if select_all else [i for i in picked if i in labels]
+
+    for col, (label, func) in zip(st.columns(len(actions) + 1), actions):
+        with col:
+            if st.button(label, key=f"{key}_{label}", disabled=not ids, use_container_width=True):
+                func([i for i in ids if i in shown])
+                for widget in (f"{key}_all", f"{key}_pick"): st.session_state.pop(widget, None)
+                st.rerun()
+    st.markdown("---")
+
 # -----------------------------------------------------------------------------
 # 4. PATIENT DASHBOARD (HUB MENU STYLE)
 # -----------------------------------------------------------------------------
@@ -256,18 +358,38 @@ def patient_dashboard():
             
         st.subheader("💬 AI Health Assistant")
         
-        # Chat History
+        # Chat History: one page of bubbles (a reply still on its way is drawn by pending_reply_bubble)
+        history = st.session_state.chat_history
+        pending = st.session_state.pending_reply
+        shown, pages = chat_history.page(history, st.session_state.chat_page, CHAT_PAGE_SIZE)
+        st.session_state.chat_page = min(st.session_state.chat_page, pages - 1)
+        summary = chat_history.summary_text(history)
+        if summary and st.session_state.chat_page == pages - 1: st.caption(f"🗂️ {summary}")
+        if st.session_state.chat_page < pages - 1 and st.button("⬆️ Earlier messages"):
+            st.session_state.chat_page += 1
+            st.rerun()
         with st.container():
-            for msg in st.session_state.chat_history:
+            for i, msg in shown:
+                if pending is not None and i == pending["index"]: continue
                 css = "user-bubble" if msg["role"] == "user" else "bot-bubble"
                 st.markdown(f"<div style='overflow:hidden'><div class='{css}'>{msg['content']}</div></div>", unsafe_allow_html=True)
+            if pending is not None and st.session_state.chat_page == 0: pending_reply_bubble()
+        if st.session_state.chat_page > 0 and st.button("⬇️ Latest messages"):
+            st.session_state.chat_page = 0
+            st.rerun()
         
         user_input = st.chat_input("Describe your symptoms...")
         
         if user_input:
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
+            if st.session_state.pending_reply is not None:
+                # A new question supersedes the reply still on its way
+                pending = st.session_state.pending_reply
+                chat_history.set_content(history, pending["index"], chatbot.cancel_ai_response(pending["job"]))
+                st.session_state.pending_reply = None
+            st.session_state.chat_page = 0
             
             condition = predictor.predict_condition(user_input)
+            chat_history.append(history, "user", user_input, condition=condition)
             recs = pd.DataFrame()
             if condition != "General":
                 recs = model.get_recommendations(condition, df)
@@ -275,8 +397,21 @@ def patient_dashboard():
             else:
                 st.session_state.current_recs = pd.DataFrame()
                 
-            ai_reply = chatbot.get_ai_response(GITHUB_TOKEN, user_input, recs, st.session_state.chat_history)
-            st.session_state.chat_history.append({"role": "assistant", "content": ai_reply})
+            if chatbot.PIPELINE_MODE:
+                # Database answer + drug table right away; the AI reply replaces it when ready
+                job = chatbot.start_ai_response(GITHUB_TOKEN, user_input, recs, history, condition=condition)
+                index = chat_history.append(history, "assistant", job["placeholder"])
+                st.session_state.pending_reply = {"job": job, "index": index}
+                st.rerun()
+
+            # Stream the reply into a bubble as tokens arrive
+            st.markdown(f"<div style='overflow:hidden'><div class='user-bubble'>{user_input}</div></div>", unsafe_allow_html=True)
+            reply_box = st.empty()
+            ai_reply = ""
+            for piece in chatbot.stream_ai_response(GITHUB_TOKEN, user_input, recs, history, condition=condition):
+                ai_reply += piece
+                reply_box.markdown(f"<div style='overflow:hidden'><div class='bot-bubble'>{ai_reply}</div></div>", unsafe_allow_html=True)
+            chat_history.append(history, "assistant", ai_reply)
             st.rerun()
 
         if 'current_recs' in st.session_state and not st.session_state.current_recs.empty:
@@ -417,8 +552,9 @@ def landing_page():
                 else: st.error(msg)
 
 if __name__ == "__main__":
-    if st.session_state.user:
-        if st.session_state.user['role'] == 'doctor': doctor_dashboard()
-        elif st.session_state.user['role'] == 'admin': admin_dashboard()
-        else: patient_dashboard()
-    else: landing_page()
\ No newline at end of file
+    role = st.session_state.user['role'] if st.session_state.user else "guest"
+    with telemetry.span("app.rerun", view=role): # Also recorded when st.rerun() cuts the run short
+        if role == 'doctor': doctor_dashboard()
+        elif role == 'admin': admin_dashboard()
+        elif role != "guest": patient_dashboard()
+        else: landing_page()
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Throughput benchmark for the headless API (api.py).
+
+    python -m benchmarks.bench_api --workers 1 4 --clients 8 --requests 2000
+    python -m benchmarks.bench_api --url http://127.0.0.1:8000 --clients 16
+
+Starts api.py once per --workers value (on synthetic data of --rows rows
+unless --data points at a folder with drugs.csv and doctors.csv) and drives
+every endpoint from --clients client processes, each on its own keep-alive
+connection. Reports requests/s, items/s (batch endpoints answer --batch items
+per request) and p50/p95/p99 latency. With --url a running server is measured instead.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks import synthetic
+from benchmarks.bench_chat import DEFAULT_CORPUS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCTOR_QUERIES = ["derma", "neuro", "cardio", "psych", "general", "dr", "surg", "pediatrics", "ortho", "ent"]
+
+def make_payloads(kind, count, batch, seed=0):
+    """(path, body, items) for `count` requests of one endpoint."""
+    rng = random.Random(seed)
+    def texts(n): return [f"{rng.choice(DEFAULT_CORPUS)} {rng.randrange(10**6)}" for _ in range(n)]
+    def conditions(n): return [rng.choice(synthetic.CONDITIONS).lower() for _ in range(n)]
+    def queries(n): return [rng.choice(DOCTOR_QUERIES) for _ in range(n)]
+
+    makers = {
+        "predict": lambda: ("/v1/predict", {"text": texts(1)[0]}, 1),
+        "predict_batch": lambda: ("/v1/predict/batch", {"texts": texts(batch)}, batch),
+        "recommend": lambda: ("/v1/recommend", {"condition": conditions(1)[0]}, 1),
+        "recommend_batch": lambda: ("/v1/recommend/batch", {"conditions": conditions(batch)}, batch),
+        "doctors_search": lambda: ("/v1/doctors/search", {"query": queries(1)[0]}, 1),
+        "doctors_search_batch": lambda: ("/v1/doctors/search/batch", {"queries": queries(batch)}, batch),
+    }
+    return [makers[kind]() for _ in range(count)]
+
+def _client(url, payloads):
+    """Sends the requests one after another on one connection; returns latencies (s) and error count."""
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    latencies, errors = [], 0
+    for path, body, _ in payloads:
+        data = json.dumps(body)
+        t0 = time.perf_counter()
+        conn.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - t0)
+        errors += response.status != 200
+    conn.close()
+    return latencies, errors
+
+def run_endpoint(url, kind, requests, batch, clients, pool):
+    payloads = make_payloads(kind, requests, batch)
+    shares = [payloads[i::clients] for i in range(clients)]
+    t0 = time.perf_counter()
+    results = list(pool.map(_client, [url] * clients, shares))
+    elapsed = time.perf_counter() - t0
+
+    latencies = np.concatenate([lat for lat, _ in results]) * 1000
+    return {
+        "endpoint": kind, "requests": requests, "clients": clients,
+        "errors": sum(err for _, err in results),
+        "requests_per_s": requests / elapsed,
+        "items_per_s": sum(items for _, _, items in payloads) / elapsed,
+        **{f"p{q}_ms": float(np.percentile(latencies, q)) for q in (50, 95, 99)},
+    }
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_api(workers, drugs, doctors, timeout=300):
+    """Starts api.py in a subprocess and waits until it answers. Returns (process, url)."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "api.py"), "--port", str(port), "--workers", str(workers),
+         "--drugs", drugs, "--doctors", doctors],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None: raise RuntimeError(f"api.py exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("api.py did not start in time")
+
+def print_result(r):
+    print(f"   {r['endpoint']:<22} {r['requests_per_s']:9.1f} req/s {r['items_per_s']:10.1f} items/s   "
+          f"p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms"
+          + (f"   ❌ {r['errors']} errors" if r['errors'] else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="measure a running API instead of starting one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=8, help="client processes")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--batch", type=int, default=100, help="items per batch request")
+    parser.add_argument("--endpoints", nargs="+", default=[
+        "predict", "predict_batch", "recommend", "recommend_batch", "doctors_search", "doctors_search_batch"])
+    parser.add_argument("--data", help="folder with drugs.csv and doctors.csv (default: synthetic)")
+    parser.add_argument("--rows", type=int, default=10000, help="rows of the synthetic dataset")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(args.clients) as pool:
+        if args.url:
+            levels = [(None, args.url)]
+        else:
+            data = args.data
+            if data is None:
+                data = tmp
+                synthetic.write_dataset(tmp, args.rows)
+                print(f"📦 Synthetic dataset, {args.rows:,} rows")
+            levels = [(workers, None) for workers in args.workers]
+
+        for workers, url in levels:
+            process = None
+            if url is None:
+                process, url = start_api(workers, os.path.join(data, "drugs.csv"), os.path.join(data, "doctors.csv"))
+                print(f"🚀 {workers} worker(s), {args.clients} clients, batch {args.batch}")
+            else:
+                print(f"🌐 {url}, {args.clients} clients, batch {args.batch}")
+            try:
+                for kind in args.endpoints:
+                    result = run_endpoint(url, kind, args.requests, args.batch, args.clients, pool)
+                    result["workers"] = workers
+                    report.append(result)
+                    print_result(result)
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clients": args.clients, "batch": args.batch, "results": report}, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
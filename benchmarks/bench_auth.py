@@ -0,0 +1,82 @@
+"""
+Login throughput benchmark.
+
+    python -m benchmarks.bench_auth --users 10000 --rounds 4 10 12 --concurrency 1 4 16
+
+Builds a throwaway users.csv, then measures username lookups (index vs. the
+old boolean-mask scan) and full logins at several bcrypt cost factors and
+levels of concurrent sessions.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import pandas as pd
+
+from modules import auth
+
+def make_users(path, n_users, rounds):
+    # One shared hash keeps setup fast; verification cost is the same per user
+    hashed_pw = bcrypt.hashpw(b"secret123", bcrypt.gensalt(rounds)).decode('utf-8')
+    pd.DataFrame({
+        "username": [f"user{i}" for i in range(n_users)],
+        "password": hashed_pw,
+        "role": "patient",
+    }).to_csv(path, index=False)
+
+def bench_lookup(n_users, n_lookups=2000):
+    names = [f"user{(i * 7919) % n_users}" for i in range(n_lookups)]
+    users = auth.load_users()
+
+    t0 = time.perf_counter()
+    for name in names:
+        users[users['username'] == name]
+    scan = time.perf_counter() - t0
+
+    auth._get_user(names[0]) # Build the index outside the timed loop
+    t0 = time.perf_counter()
+    for name in names:
+        auth._get_user(name)
+    indexed = time.perf_counter() - t0
+    return n_lookups / scan, n_lookups / indexed
+
+def bench_logins(n_users, n_logins, concurrency):
+    names = [f"user{(i * 7919) % n_users}" for i in range(n_logins)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as sessions:
+        results = list(sessions.map(lambda u: auth.login_user(u, "secret123")[1], names))
+    elapsed = time.perf_counter() - t0
+    assert all(r == "Success" for r in results), "benchmark logins failed"
+    return n_logins / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[4, 10, auth.BCRYPT_ROUNDS])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"👥 Users: {args.users:,}   bcrypt workers: {auth.BCRYPT_WORKERS}")
+        print("=" * 50)
+        for rounds in args.rounds:
+            # Fresh file per cost factor, so no background rehash kicks in
+            auth.USERS_FILE = os.path.join(tmp, f"users_{rounds}.csv")
+            auth.BCRYPT_ROUNDS = rounds
+            make_users(auth.USERS_FILE, args.users, rounds)
+
+            scan_rate, index_rate = bench_lookup(args.users)
+            print(f"🔐 Cost factor {rounds}")
+            print(f"   Lookup (mask scan):  {scan_rate:12,.0f} /s")
+            print(f"   Lookup (index):      {index_rate:12,.0f} /s")
+            for concurrency in args.concurrency:
+                rate = bench_logins(args.users, args.logins, concurrency)
+                print(f"   Logins @ {concurrency:>3} sessions: {rate:10,.1f} /s")
+        print("=" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+End-to-end chat latency benchmark against the local LLM stub.
+
+    python -m benchmarks.bench_chat --turns 200 --concurrency 1 4 16 --error-rates 0 0.2
+    python -m benchmarks.bench_chat --endpoint http://127.0.0.1:8911 --stream
+
+Replays a corpus of user messages through predictor.predict_condition ->
+model.get_recommendations -> chatbot.get_ai_response (or stream_ai_response
+with --stream) from concurrent sessions. Reports p50/p95/p99 per stage,
+turns per second and how many turns fell back to the offline answer.
+Direct database answers (chatbot.DIRECT_ANSWER_WORDS) are off unless
+--direct-answers is given, so every turn measures the LLM. Unless
+--endpoint is given, a stub from benchmarks/llm_stub.py is started in-process
+and its error rate is changed per scenario.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import llm_stub
+from modules import chatbot, condition_matcher, model, predictor
+
+STAGES = ["predict", "recommend", "first_token", "chat", "total"]
+
+DEFAULT_CORPUS = [
+    "I have a terrible headache since morning",
+    "best medicine for acne",
+    "my skin is itchy and red",
+    "I can't sleep at night",
+    "feeling very anxious and restless",
+    "hello",
+    "high blood pressure medicine",
+    "joint pain in my knees",
+    "bad cough and sore throat",
+    "stomach pain after eating",
+    "what helps with migraine",
+    "hair fall treatment",
+    "I feel sad all the time",
+    "acid reflux and heartburn",
+    "hi, how are you",
+    "allergy with sneezing and runny nose",
+]
+
+def load_corpus(path):
+    if not path: return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def run_turn(user_input, df, api_key, stream, use_cache):
+    timings = {}
+    t0 = time.perf_counter()
+    condition = predictor.predict_condition(user_input)
+    t1 = time.perf_counter()
+    recs = model.get_recommendations(condition, df) if condition != "General" else pd.DataFrame()
+    t2 = time.perf_counter()
+
+    if stream:
+        pieces = []
+        for piece in chatbot.stream_ai_response(api_key, user_input, recs, [], condition=condition, use_cache=use_cache):
+            if not pieces: timings["first_token"] = time.perf_counter() - t2
+            pieces.append(piece)
+        reply = "".join(pieces)
+    else:
+        reply = chatbot.get_ai_response(api_key, user_input, recs, [], condition=condition, use_cache=use_cache)
+    t3 = time.perf_counter()
+
+    timings.update(predict=t1 - t0, recommend=t2 - t1, chat=t3 - t2, total=t3 - t0)
+    timings.setdefault("first_token", timings["chat"])
+    if reply == chatbot._generate_offline_response(recs): answer = "fallback"
+    elif reply == chatbot._generate_offline_response(recs, direct=True): answer = "direct"
+    else: answer = "llm"
+    return timings, answer
+
+def run_level(corpus, df, concurrency, turns, api_key, stream, use_cache):
+    messages = [corpus[i % len(corpus)] for i in range(turns)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as sessions:
+        results = list(sessions.map(lambda m: run_turn(m, df, api_key, stream, use_cache), messages))
+    elapsed = time.perf_counter() - t0
+
+    summary = {"concurrency": concurrency, "turns": turns,
+               "throughput": turns / elapsed,
+               "fallbacks": sum(answer == "fallback" for _, answer in results),
+               "direct_answers": sum(answer == "direct" for _, answer in results)}
+    for stage in STAGES:
+        values = np.array([timings[stage] for timings, _ in results]) * 1000
+        summary[stage] = {f"p{q}": float(np.percentile(values, q)) for q in (50, 95, 99)}
+    return summary
+
+def print_summary(s, stream):
+    stages = STAGES if stream else [stage for stage in STAGES if stage != "first_token"]
+    print(f"   @ {s['concurrency']:>3} sessions: {s['throughput']:8.1f} turns/s   "
+          f"offline fallbacks {s['fallbacks']}/{s['turns']}"
+          + (f"   direct answers {s['direct_answers']}" if s['direct_answers'] else ""))
+    for stage in stages:
+        p = s[stage]
+        print(f"      {stage:<12} p50 {p['p50']:9.2f} ms   p95 {p['p95']:9.2f} ms   p99 {p['p99']:9.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="drugs.csv")
+    parser.add_argument("--corpus", help="text file, one user message per line")
+    parser.add_argument("--turns", type=int, default=200, help="turns per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--error-rates", type=float, nargs="+", default=[0.0, 0.2],
+                        help="stub error rates to run, one scenario each")
+    parser.add_argument("--endpoint", help="use a running endpoint instead of the in-process stub")
+    parser.add_argument("--api-key", default="stub-benchmark-token")
+    parser.add_argument("--stream", action="store_true", help="use stream_ai_response (adds time to first token)")
+    parser.add_argument("--cache", action="store_true", help="let the response cache answer repeats")
+    parser.add_argument("--direct-answers", action="store_true",
+                        help="let short condition-name queries skip the LLM (off: every turn calls it)")
+    parser.add_argument("--retries", type=int, default=chatbot.MAX_RETRIES)
+    parser.add_argument("--timeout", type=float, default=chatbot.REQUEST_TIMEOUT)
+    parser.add_argument("--json", help="write the results to this file")
+    llm_stub.add_arguments(parser)
+    args = parser.parse_args()
+
+    chatbot.MAX_RETRIES, chatbot.REQUEST_TIMEOUT = args.retries, args.timeout
+    if not args.direct_answers: chatbot.DIRECT_ANSWER_WORDS = 0 # Measure the LLM on every turn
+    server = None
+    if args.endpoint:
+        chatbot.ENDPOINT = args.endpoint
+        scenarios = [None]
+    else:
+        server, chatbot.ENDPOINT = llm_stub.start_stub(**llm_stub.config_from_args(args))
+        scenarios = args.error_rates
+
+    df = model.load_data(args.data)
+    condition_matcher.DRUGS_FILE = args.data # Keywords from the same dataset as the recommendations
+    if df.empty: print(f"⚠️  No data in {args.data}; every turn gets empty recommendations.")
+    predictor.warm_up()
+    corpus = load_corpus(args.corpus)
+
+    print(f"💬 {len(corpus)} messages, {args.turns} turns per level, endpoint {chatbot.ENDPOINT}")
+    print("=" * 80)
+    report = []
+    try:
+        for error_rate in scenarios:
+            if server is not None:
+                server.config["error_rate"] = error_rate
+                print(f"🧪 Injected error rate {error_rate:.0%}   retries {args.retries}")
+            else:
+                print(f"🌐 {args.endpoint}")
+            for concurrency in args.concurrency:
+                summary = run_level(corpus, df, concurrency, args.turns, args.api_key, args.stream, args.cache)
+                summary["error_rate"] = error_rate
+                print_summary(summary, args.stream)
+                report.append(summary)
+    finally:
+        if server is not None: server.shutdown()
+    print("=" * 80)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Predictor startup time and per-process memory: legacy joblib pair vs. the
+fused, memory-mapped pipeline.
+
+    python -m benchmarks.bench_predictor_load --procs 4
+
+Each mode starts --procs worker processes at once (like Streamlit replicas on
+one host). Every worker loads + warms up the models and reports import time,
+load time, RSS and, on Linux, PSS (RSS with shared pages split between the
+processes mapping them). If models/condition_pipeline.joblib does not exist yet, a
+temporary one is built from the legacy files.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from modules import predictor
+
+WORKER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from modules import predictor
+t1 = time.perf_counter()
+predictor.PIPELINE_PATH = sys.argv[1]
+ok = predictor.warm_up()
+import_s, load_s = t1 - t0, time.perf_counter() - t1
+time.sleep(float(sys.argv[2]))  # Stay alive while the other workers map the same file
+
+mem = {}
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            if key in ("Rss", "Pss"): mem[key.lower()] = int(value.split()[0]) * 1024
+except OSError:
+    import resource
+    mem["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(json.dumps({"ok": ok, "import_s": import_s, "load_s": load_s, **mem}))
+"""
+
+def run_mode(pipeline_path, procs, hold):
+    workers = [
+        subprocess.Popen([sys.executable, "-W", "ignore", "-c", WORKER, pipeline_path, str(hold)],
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(procs)
+    ]
+    results = [json.loads(w.communicate()[0].strip().splitlines()[-1]) for w in workers]
+    assert all(r["ok"] for r in results), "model loading failed in a worker"
+    return results
+
+def summarize(name, results):
+    avg = lambda key: sum(r.get(key, 0) for r in results) / len(results)
+    line = f"{name:<20} import {avg('import_s') * 1000:7.0f} ms   load {avg('load_s') * 1000:6.1f} ms   RSS {avg('rss') / 2**20:7.1f} MiB"
+    if "pss" in results[0]:
+        line += f"   PSS {avg('pss') / 2**20:7.1f} MiB"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds workers stay alive together")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fused_path = predictor.PIPELINE_PATH
+        if not os.path.exists(fused_path):
+            predictor.PIPELINE_PATH = os.path.join(tmp, "missing.joblib") # Force the legacy pair
+            if not predictor.load_models():
+                sys.exit("❌ No models found. Run train.py first.")
+            fused_path = os.path.join(tmp, "condition_pipeline.joblib")
+            predictor.save_pipeline(predictor._vectorizer, predictor._svm_model, fused_path)
+
+        print(f"⚙️  {args.procs} worker processes per mode")
+        print("=" * 90)
+        summarize("Legacy joblib pair", run_mode(os.path.join(tmp, "missing.joblib"), args.procs, args.hold))
+        summarize("Fused + mmap", run_mode(fused_path, args.procs, args.hold))
+        print("=" * 90)
+
+if __name__ == "__main__":
+    main()
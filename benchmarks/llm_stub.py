@@ -0,0 +1,169 @@
+"""
+Local stand-in for the OpenAI-compatible chat endpoint.
+
+    python -m benchmarks.llm_stub --port 8911 --latency 0.3 --tokens-per-sec 40 --error-rate 0.1
+    SAMHATI_LLM_ENDPOINT=http://127.0.0.1:8911 streamlit run app.py
+
+Serves POST /chat/completions (plain and stream=True server-sent events) with
+a canned reply. Time to first token, token rate, reply length and injected
+failures (HTTP 500/429 errors, requests that hang past the client timeout)
+are configurable, so the chat pipeline can be measured without the real service.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONFIG = {
+    "latency": 0.2,         # seconds before the first token
+    "jitter": 0.05,         # +/- uniform noise on the latency
+    "tokens_per_sec": 50.0, # 0 = whole reply at once
+    "reply_tokens": 60,
+    "error_rate": 0.0,      # share of requests answered with HTTP 500
+    "throttle_rate": 0.0,   # share of requests answered with HTTP 429
+    "hang_rate": 0.0,       # share of requests that never answer (until hang_seconds)
+    "hang_seconds": 60.0,
+    "seed": None,
+}
+
+REPLY_WORDS = (
+    "Based on the ratings in the database, the top drug is a well reviewed option for "
+    "your condition. Take it as prescribed, watch for the listed side effects and talk "
+    "to a doctor if symptoms persist or get worse."
+).split()
+
+def _reply_tokens(n):
+    return [("" if i == 0 else " ") + REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(n)]
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real endpoint
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+
+        config, roll = server.config, server.roll()
+        server.count("requests")
+        if roll < config["error_rate"]:
+            server.count("errors")
+            return self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+        roll -= config["error_rate"]
+        if roll < config["throttle_rate"]:
+            server.count("throttled")
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            body = b'{"error": {"message": "injected rate limit", "type": "rate_limit"}}'
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        roll -= config["throttle_rate"]
+        if roll < config["hang_rate"]:
+            server.count("hung")
+            time.sleep(config["hang_seconds"])
+            return self._send_json(504, {"error": {"message": "injected hang"}})
+
+        time.sleep(max(0.0, config["latency"] + random.uniform(-1, 1) * config["jitter"]))
+        tokens = _reply_tokens(config["reply_tokens"])
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                "model": request.get("model", "stub")}
+
+        if not request.get("stream"):
+            if config["tokens_per_sec"] > 0: time.sleep(len(tokens) / config["tokens_per_sec"])
+            return self._send_json(200, {**base, "object": "chat.completion", "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens)},
+            }]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close") # Body length unknown up front
+        self.end_headers()
+        delay = 1 / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0
+        try:
+            for i, token in enumerate(tokens):
+                delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if delay: time.sleep(delay)
+            done = {**base, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "hung": 0}
+        self._rng = random.Random(config["seed"])
+        self._lock = threading.Lock()
+
+    def roll(self):
+        with self._lock:
+            return self._rng.random()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+def start_stub(host="127.0.0.1", port=0, **config):
+    """Starts the stub on a background thread. Returns (server, base_url); stop with server.shutdown()."""
+    server = StubServer((host, port), {**DEFAULT_CONFIG, **config})
+    threading.Thread(target=server.serve_forever, daemon=True, name="llm-stub").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=DEFAULT_CONFIG["latency"], help="seconds to first token")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_CONFIG["jitter"])
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_CONFIG["tokens_per_sec"])
+    parser.add_argument("--reply-tokens", type=int, default=DEFAULT_CONFIG["reply_tokens"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"], help="share of HTTP 500 replies")
+    parser.add_argument("--throttle-rate", type=float, default=DEFAULT_CONFIG["throttle_rate"], help="share of HTTP 429 replies")
+    parser.add_argument("--hang-rate", type=float, default=DEFAULT_CONFIG["hang_rate"], help="share of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=DEFAULT_CONFIG["hang_seconds"])
+    parser.add_argument("--seed", type=int, default=None)
+
+def config_from_args(args):
+    return {key: getattr(args, key) for key in DEFAULT_CONFIG}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), config_from_args(args))
+    print(f"🤖 LLM stub listening on http://{args.host}:{server.server_address[1]}")
+    print(f"   export SAMHATI_LLM_ENDPOINT=http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
+
+if __name__ == "__main__":
+    main()
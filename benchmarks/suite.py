@@ -0,0 +1,238 @@
+"""
+Benchmark suite: every data path of the app, on synthetic data of growing size.
+
+    python -m benchmarks.suite --sizes 1000 10000 100000 --json results.json
+    python -m benchmarks.suite --sizes 1000 10000 100000 --baseline results.json
+
+For each size a fresh dataset is generated (benchmarks/synthetic.py) and the
+modules are pointed at it. Every case reports median / p95 latency per call.
+With --baseline, results are compared with a stored run: cases slower than
+--tolerance are flagged and the exit status is 1, so it can gate CI.
+Size-independent cases (the predictor) run once and are reported with size null.
+
+Focused benchmarks live next to this one: bench_auth (bcrypt cost factors),
+bench_predictor_load (model memory per process) and bench_chat (LLM latency).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+from modules import appointments, auth, condition_matcher, datastore, doctor_manager, model, predictor
+
+QUERIES = [
+    "I have a terrible headache", "best medicine for acne", "my skin is itchy and red",
+    "I can't sleep at night", "feeling anxious all the time", "high blood pressure",
+    "joint pain in my knees", "bad cough and fever", "stomach burns after meals", "hair fall",
+]
+
+KEYWORD_QUERIES = ["acne", "sir dard ho raha hai", "best medicine for migraine", "high bp",
+                   "baal jhad rahe hai", "loose motions since morning", "I can't sleep"]
+
+BULK_SIZE = 50 # Appointments per bulk action
+
+def measure(calls):
+    """Runs each zero-argument callable once; returns latency stats in ms."""
+    times = []
+    for call in calls:
+        t0 = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        "calls": len(times),
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "total_s": sum(times) / 1000,
+    }
+
+def point_modules_at(paths):
+    model.CACHE_DIR = os.path.join(os.path.dirname(paths["drugs.csv"]), "cache")
+    auth.USERS_FILE = paths["users.csv"]
+    doctor_manager.DOCTORS_FILE = paths["doctors.csv"]
+    appointments.APPOINTMENTS_DB = paths["appointments.db"]
+    appointments.APPOINTMENTS_FILE = paths["appointments.csv"]
+
+def bench_model(paths, calls, rng):
+    drugs_path = paths["drugs.csv"]
+    results = {}
+
+    # Cold: no Arrow copy and nothing in the Streamlit cache (clean + index build)
+    model._load_data.clear()
+    results["model.load_data[cold]"] = measure([lambda: model.load_data(drugs_path)])
+    model._load_data.clear()
+    results["model.load_data[mapped]"] = measure([lambda: model.load_data(drugs_path)])
+    results["model.load_data[cached]"] = measure([lambda: model.load_data(drugs_path)] * calls)
+
+    df = model.load_data(drugs_path)
+    names = list(df['medical_condition'].cat.categories)
+    exact = [rng.choice(names).lower() for _ in range(calls)]
+    partial = [rng.choice(names).lower()[:3] for _ in range(calls)]
+    results["model.get_recommendations[exact]"] = measure([lambda c=c: model.get_recommendations(c, df) for c in exact])
+    results["model.get_recommendations[partial]"] = measure([lambda c=c: model.get_recommendations(c, df) for c in partial])
+    return results
+
+def bench_predictor(calls, rng):
+    # Queries naming a condition are answered by the keyword automaton, without the SVM
+    automaton = condition_matcher.load(synthetic.CONDITIONS)
+    named = [f"{rng.choice(KEYWORD_QUERIES)} {i}" for i in range(calls)]
+    results = {"condition_matcher.build": measure([lambda: condition_matcher.build(synthetic.CONDITIONS)])}
+    results["condition_matcher.find"] = measure([lambda q=q: condition_matcher.find(q, automaton) for q in named])
+    results["predictor.predict_condition[keyword]"] = measure([lambda q=q: predictor.predict_condition(q) for q in named])
+
+    if not predictor.warm_up():
+        print("⚠️  No models found; SVM cases skipped.")
+        return results
+    condition_matcher.load([]) # Empty automaton: the cases below measure the SVM path
+    unique = [f"{rng.choice(QUERIES)} {i}" for i in range(calls)]
+    repeated = [rng.choice(QUERIES) for _ in range(calls)]
+    predictor.clear_query_cache()
+    results["predictor.predict_condition[uncached]"] = measure([lambda q=q: predictor.predict_condition(q) for q in unique])
+    results["predictor.predict_condition[cached]"] = measure([lambda q=q: predictor.predict_condition(q) for q in repeated])
+    return results
+
+def bench_auth(size, calls, rng):
+    names = [f"user{rng.randrange(size - 1)}" for _ in range(calls)]
+    auth.login_user(names[0], synthetic.PASSWORD) # Loads the table and builds the username index
+    results = {"auth.login_user": measure([lambda u=u: auth.login_user(u, synthetic.PASSWORD) for u in names])}
+
+    signups = max(calls // 10, 5)
+    new_names = [f"bench_{size}_{i}" for i in range(signups)]
+    results["auth.signup_user"] = measure([lambda u=u: auth.signup_user(u, synthetic.PASSWORD) for u in new_names])
+    results["datastore.flush[users]"] = measure([lambda: datastore.flush(auth.USERS_FILE)])
+    return results
+
+def bench_doctors(calls, rng):
+    docs = doctor_manager.get_all_doctors()
+    names = docs['username'].tolist()
+    prefixes = [rng.choice(names).split()[1][:3] for _ in range(calls)]
+    results = {"doctor_manager.get_all_doctors[all]": measure([doctor_manager.get_all_doctors] * calls)}
+    # First search after a change builds the index
+    results["doctor_manager.get_all_doctors[index build]"] = measure([lambda: doctor_manager.get_all_doctors("cardio")])
+    results["doctor_manager.get_all_doctors[prefix]"] = measure([lambda q=q: doctor_manager.get_all_doctors(q) for q in prefixes])
+    results["doctor_manager.get_all_doctors[fuzzy]"] = measure([lambda: doctor_manager.get_all_doctors("dermatologist")] * calls)
+    results["doctor_manager.update_doctor_status"] = measure(
+        [lambda u=u: doctor_manager.update_doctor_status(u, "Busy") for u in rng.sample(names, min(calls, len(names)))])
+    datastore.flush(doctor_manager.DOCTORS_FILE)
+    return results
+
+def bench_appointments(paths, calls, rng):
+    bulk_calls = max(calls // 10, 1)
+    with appointments._db() as conn:
+        doctors = [r[0] for r in conn.execute("SELECT DISTINCT doctor FROM appointments LIMIT 50")]
+        patients = [r[0] for r in conn.execute("SELECT DISTINCT patient FROM appointments LIMIT 200")]
+        ids = [r[0] for r in conn.execute("SELECT id FROM appointments ORDER BY RANDOM() LIMIT ?",
+                                          (calls * 2 + 2 * bulk_calls * BULK_SIZE,))]
+    doctor = doctors[0]
+    batches = [ids[calls * 2 + i * BULK_SIZE:calls * 2 + (i + 1) * BULK_SIZE] for i in range(2 * bulk_calls)]
+
+    results = {}
+    results["appointments.request_appointment"] = measure(
+        [lambda: appointments.request_appointment(rng.choice(patients), rng.choice(doctors), "Acne")] * calls)
+    results["appointments.get_doctor_appointments"] = measure(
+        [lambda d=d: appointments.get_doctor_appointments(d) for d in rng.choices(doctors, k=calls)])
+    results["appointments.get_patient_appointments"] = measure(
+        [lambda p=p: appointments.get_patient_appointments(p) for p in rng.choices(patients, k=calls)])
+    results["appointments.update_status"] = measure(
+        [lambda i=i: appointments.update_status(i, "Accepted") for i in ids[:calls]])
+    results["appointments.delete_appointment"] = measure(
+        [lambda i=i: appointments.delete_appointment(i) for i in ids[calls:]])
+    # One transaction per batch of BULK_SIZE ids (the doctor dashboard's multi-select)
+    results[f"appointments.update_statuses[{BULK_SIZE}]"] = measure(
+        [lambda b=b: appointments.update_statuses(b, "Accepted") for b in batches[:bulk_calls]])
+    results[f"appointments.delete_appointments[{BULK_SIZE}]"] = measure(
+        [lambda b=b: appointments.delete_appointments(b) for b in batches[bulk_calls:]])
+    results["appointments.get_doctor_version"] = measure([lambda: appointments.get_doctor_version(doctor)] * calls)
+
+    feed = appointments.sync_doctor_appointments(doctor)
+    def change_and_sync():
+        nonlocal feed
+        appointments.request_appointment(rng.choice(patients), doctor, "Acne")
+        feed = appointments.sync_doctor_appointments(doctor, feed)
+    results["appointments.sync_doctor_appointments[1 change]"] = measure([change_and_sync] * calls)
+    return results
+
+def run(sizes, calls, rounds, workdir):
+    rng = random.Random(0)
+    results = []
+
+    def record(size, cases):
+        for name, stats in cases.items():
+            results.append({"name": name, "size": size, **stats})
+            print(f"   {name:<52} {stats['median_ms']:10.3f} ms  p95 {stats['p95_ms']:10.3f} ms")
+
+    print("🧠 predictor (size independent)")
+    record(None, bench_predictor(calls, rng))
+
+    auth.BCRYPT_ROUNDS = rounds # Same cost as the synthetic hashes: no background rehash
+    for size in sizes:
+        print(f"📦 {size:,} rows")
+        paths = synthetic.write_dataset(os.path.join(workdir, str(size)), size, rounds)
+        point_modules_at(paths)
+        record(size, bench_model(paths, calls, rng))
+        record(size, bench_auth(size, calls, rng))
+        record(size, bench_doctors(calls, rng))
+        record(size, bench_appointments(paths, calls, rng))
+    return results
+
+def compare(results, baseline, tolerance, min_ms):
+    """Prints the cases slower than the baseline; returns how many regressed."""
+    base = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"{'case':<52} {'size':>9} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for r in results:
+        old = base.get((r["name"], r["size"]))
+        if old is None: continue
+        ratio = r["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        slower = ratio > 1 + tolerance and r["median_ms"] - old["median_ms"] > min_ms
+        regressions += slower
+        flag = "❌" if slower else ("✅" if ratio < 1 - tolerance else "  ")
+        size = "-" if r["size"] is None else f"{r['size']:,}"
+        print(f"{r['name']:<52} {size:>9} {old['median_ms']:10.3f} {r['median_ms']:10.3f} {ratio:6.2f}x {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--calls", type=int, default=100, help="calls per case")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost of the synthetic users")
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    parser.add_argument("--workdir", help="keep the generated datasets here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args.sizes, args.calls, args.rounds, args.workdir or tmp)
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "calls": args.calls, "rounds": args.rounds,
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("=" * 95)
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        print("=" * 95)
+        if regressions:
+            print(f"❌ {regressions} case(s) slower than the baseline")
+            sys.exit(1)
+        print("✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic data in the app's file formats, for benchmarks at any size.
+
+    python -m benchmarks.synthetic --rows 100000 --out /tmp/samhati-100k
+
+Writes drugs.csv, users.csv, doctors.csv and appointments.db (plus
+appointments.csv with the same rows, the legacy format) into --out.
+Everything is seeded, so the same arguments give the same files.
+"""
+import argparse
+import os
+import sqlite3
+
+import bcrypt
+import numpy as np
+import pandas as pd
+
+CONDITIONS = [
+    "Acne", "ADHD", "Allergies", "Anxiety", "Asthma", "Bipolar Disorder", "Bronchitis",
+    "Cholesterol", "Colds & Flu", "Constipation", "COVID 19", "Depression", "Diabetes (Type 2)",
+    "Diarrhea", "Eczema", "GERD (Heartburn)", "Gout", "Hair Loss", "Hayfever", "Herpes",
+    "Hypertension", "Hypothyroidism", "Insomnia", "Migraine", "Osteoarthritis", "Pneumonia",
+    "Psoriasis", "Rheumatoid Arthritis", "Schizophrenia", "UTI",
+]
+SPECIALTIES = [
+    "Dermatology", "General Medicine", "Neurology", "Psychiatry", "Surgery", "Cardiology",
+    "Pediatrics", "Orthopedics", "Oncology", "Gynecology", "ENT", "Ophthalmology",
+    "Endocrinology", "Gastroenterology", "Urology", "Pulmonology", "Rheumatology",
+]
+SIDE_EFFECT_WORDS = (
+    "nausea headache dizziness rash itching swelling fatigue insomnia dry mouth "
+    "constipation diarrhea vomiting drowsiness blurred vision weight gain"
+).split()
+PASSWORD = "secret123" # Every synthetic user has this password
+
+def _words(rng, count, length=(4, 9)):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    sizes = rng.integers(length[0], length[1], count)
+    return ["".join(rng.choice(letters, size)).title() for size in sizes]
+
+def make_drugs(n, seed=0):
+    """Drug catalogue with the drugs.csv columns (some missing ratings/reviews, like the real file)."""
+    rng = np.random.default_rng(seed)
+    conditions = rng.choice(CONDITIONS, n)
+    effects = rng.choice(SIDE_EFFECT_WORDS, (n, 6))
+    return pd.DataFrame({
+        "drug_name": [f"drug{i}" for i in rng.integers(0, max(n // 8, 1), n)],
+        "medical_condition": conditions,
+        "side_effects": [" ".join(row) for row in effects],
+        "generic_name": "generic",
+        "drug_classes": "class",
+        "rating": np.where(rng.random(n) < 0.1, np.nan, rng.integers(0, 21, n) / 2),
+        "no_of_reviews": np.where(rng.random(n) < 0.1, np.nan, rng.zipf(1.6, n).clip(max=5000)),
+        "medical_condition_description": [f"{c} is a common condition." for c in conditions],
+    })
+
+def make_users(n, rounds=4, seed=0):
+    """users.csv: 'admin' plus n - 1 users named user0, user1, ... (one shared bcrypt hash)."""
+    rng = np.random.default_rng(seed)
+    hashed_pw = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    roles = rng.choice(["patient", "doctor"], n - 1, p=[0.8, 0.2])
+    return pd.DataFrame({
+        "username": ["admin"] + [f"user{i}" for i in range(n - 1)],
+        "password": hashed_pw,
+        "role": ["admin"] + list(roles),
+    })
+
+def make_doctors(n, seed=0):
+    """doctors.csv with n distinct 'Dr. First Last' names."""
+    rng = np.random.default_rng(seed)
+    firsts, lasts = _words(rng, 1000), _words(rng, max(2000, n // 500 + 1))
+    pairs = rng.choice(len(firsts) * len(lasts), n, replace=False)
+    return pd.DataFrame({
+        "username": [f"Dr. {firsts[p // len(lasts)]} {lasts[p % len(lasts)]}" for p in pairs],
+        "specialty": rng.choice(SPECIALTIES, n),
+        "status": rng.choice(["Available", "Busy"], n, p=[0.7, 0.3]),
+    })
+
+def make_appointments(n, patients, doctors, seed=0):
+    """Appointment rows (ids 1..n) between the given patient and doctor names."""
+    rng = np.random.default_rng(seed)
+    minutes = rng.integers(0, 365 * 24 * 60, n)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "patient": rng.choice(np.asarray(patients), n),
+        "doctor": rng.choice(np.asarray(doctors), n),
+        "condition": rng.choice(CONDITIONS, n),
+        "status": rng.choice(["Pending", "Accepted", "Rejected"], n, p=[0.4, 0.4, 0.2]),
+        "timestamp": (pd.Timestamp("2025-01-01") + pd.to_timedelta(minutes, unit="m")).strftime("%Y-%m-%d %H:%M"),
+    })
+
+def write_appointments_db(path, appts):
+    """Creates an appointments.db (current schema) holding `appts`."""
+    from modules import appointments
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(appointments._SCHEMA)
+        conn.executemany(
+            "INSERT INTO appointments (id, patient, doctor, condition, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            appts.itertuples(index=False, name=None),
+        )
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('csv_migrated', '')")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('change_feed', '1')")
+    conn.close()
+
+def write_dataset(out_dir, rows, rounds=4, seed=0):
+    """All four stores with `rows` rows each. Returns {name: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, name)
+             for name in ("drugs.csv", "users.csv", "doctors.csv", "appointments.csv", "appointments.db")}
+
+    make_drugs(rows, seed).to_csv(paths["drugs.csv"], index=False)
+    users = make_users(rows, rounds, seed)
+    users.to_csv(paths["users.csv"], index=False)
+    doctors = make_doctors(rows, seed)
+    doctors.to_csv(paths["doctors.csv"], index=False)
+
+    patients = users.loc[users['role'] == "patient", 'username']
+    # Few doctors get most appointments, like a real directory
+    busy_doctors = doctors['username'].iloc[:max(1, min(len(doctors), rows // 20))]
+    appts = make_appointments(rows, patients, busy_doctors, seed)
+    appts.to_csv(paths["appointments.csv"], index=False)
+    if os.path.exists(paths["appointments.db"]): os.remove(paths["appointments.db"])
+    write_appointments_db(paths["appointments.db"], appts)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost of the shared user hash")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_dataset(args.out, args.rows, args.rounds, args.seed)
+    for name, path in paths.items():
+        print(f"📄 {name:<18} {os.path.getsize(path) / 2**20:8.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,256 @@
 import pandas as pd
 import os
 import datetime
+import sqlite3
+import threading
+import contextlib
+from modules import telemetry
 
-APPOINTMENTS_FILE = "appointments.csv"
+APPOINTMENTS_DB = "appointments.db"
+APPOINTMENTS_FILE = "appointments.csv" # Legacy CSV store, imported once into the DB
+COLUMNS = ["id", "patient", "doctor", "condition", "status", "timestamp"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT, -- AUTOINCREMENT: ids are never reused after deletes
+    patient   TEXT NOT NULL,
+    doctor    TEXT NOT NULL,
+    condition TEXT,
+    status    TEXT NOT NULL DEFAULT 'Pending',
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor  ON appointments (doctor);
+CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient);
+CREATE INDEX IF NOT EXISTS idx_appointments_status  ON appointments (status);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+-- Change feed: latest change per (appointment, doctor), kept up to date by the
+-- triggers below (so writes from any process show up). A doctor's version is
+-- the highest seq among their rows.
+CREATE TABLE IF NOT EXISTS appointment_events (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT, -- AUTOINCREMENT: a new change always gets a higher seq
+    appt_id INTEGER NOT NULL,
+    doctor  TEXT NOT NULL,
+    op      TEXT NOT NULL -- 'upsert' or 'delete'
+);
+CREATE INDEX IF NOT EXISTS idx_events_doctor_seq ON appointment_events (doctor, seq);
+CREATE INDEX IF NOT EXISTS idx_events_appt       ON appointment_events (appt_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_appointments_insert AFTER INSERT ON appointments BEGIN
+    DELETE FROM appointment_events WHERE appt_id = NEW.id AND doctor = NEW.doctor;
+    INSERT INTO appointment_events (appt_id, doctor, op) VALUES (NEW.id, NEW.doctor, 'upsert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_appointments_update AFTER UPDATE ON appointments BEGIN
+    DELETE FROM appointment_events WHERE appt_id = OLD.id AND doctor IN (OLD.doctor, NEW.doctor);
+    INSERT INTO appointment_events (appt_id, doctor, op) SELECT OLD.id, OLD.doctor, 'delete' WHERE OLD.doctor != NEW.doctor;
+    INSERT INTO appointment_events (appt_id, doctor, op) VALUES (NEW.id, NEW.doctor, 'upsert');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_appointments_delete AFTER DELETE ON appointments BEGIN
+    DELETE FROM appointment_events WHERE appt_id = OLD.id AND doctor = OLD.doctor;
+    INSERT INTO appointment_events (appt_id, doctor, op) VALUES (OLD.id, OLD.doctor, 'delete');
+END;
+"""
+
+# One connection per process, shared by all Streamlit sessions
+_conn = None
+_conn_path = None
+_lock = threading.RLock()
 
 def init_appointments_db():
-    if not os.path.exists(APPOINTMENTS_FILE):
-        df = pd.DataFrame(columns=["id", "patient", "doctor", "condition", "status", "timestamp"])
-        df.to_csv(APPOINTMENTS_FILE, index=False)
+    """Creates the SQLite store (and imports appointments.csv) if needed."""
+    with _db():
+        pass
+
+@contextlib.contextmanager
+def _db():
+    """Yields the shared connection, holding the lock for the whole statement."""
+    global _conn, _conn_path
+    with _lock:
+        if _conn is None or _conn_path != APPOINTMENTS_DB:
+            if _conn is not None: # Repointed to another file: release the old one
+                _conn.close()
+                _conn = _conn_path = None
+            conn = sqlite3.connect(APPOINTMENTS_DB, timeout=10, check_same_thread=False)
+            try:
+                # WAL: readers in other processes don't block on a writer
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                with conn:
+                    conn.executescript(_SCHEMA)
+                migrate_from_csv(conn)
+                _backfill_events(conn)
+            except Exception:
+                conn.close()
+                raise
+            _conn, _conn_path = conn, APPOINTMENTS_DB
+        yield _conn
+
+def migrate_from_csv(conn, csv_path=None):
+    """
+    One-time import of the legacy CSV store. Existing ids are kept; rows that
+    collided with an earlier id (old len(df) + 1 bug) get fresh ids.
+    """
+    csv_path = csv_path or APPOINTMENTS_FILE
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+        return 0
+
+    # Write lock first, so replicas starting together import the CSV only once.
+    # The with block commits, or rolls back (releasing the lock) if the import raises.
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+            return 0
+        if not os.path.exists(csv_path):
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('csv_migrated', '')")
+            return 0
+
+        legacy = pd.read_csv(csv_path, dtype=str).fillna("")
+        seen = set()
+        kept, renumbered = [], []
+        for rec in legacy.to_dict("records"):
+            appt_id = int(float(rec["id"])) if rec.get("id") else None
+            row = (rec.get("patient", ""), rec.get("doctor", ""), rec.get("condition", ""),
+                   rec.get("status") or "Pending", rec.get("timestamp", ""))
+            if appt_id is None or appt_id in seen:
+                renumbered.append(row)
+            else:
+                seen.add(appt_id)
+                kept.append((appt_id,) + row)
+
+        conn.executemany(
+            "INSERT INTO appointments (id, patient, doctor, condition, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            kept,
+        )
+        # After the explicit ids, so fresh ids can't collide with a later kept one
+        conn.executemany(
+            "INSERT INTO appointments (patient, doctor, condition, status, timestamp) VALUES (?, ?, ?, ?, ?)",
+            renumbered,
+        )
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('csv_migrated', ?)", (os.path.abspath(csv_path),))
+    return len(kept) + len(renumbered)
+
+def _backfill_events(conn):
+    """Feed entries for rows written before the change-feed triggers existed (runs once)."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'change_feed'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    with conn: # Commits, or rolls back (releasing the write lock) on error
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'change_feed'").fetchone():
+            return
+        conn.execute(
+            "INSERT INTO appointment_events (appt_id, doctor, op) "
+            "SELECT id, doctor, 'upsert' FROM appointments a "
+            "WHERE NOT EXISTS (SELECT 1 FROM appointment_events e WHERE e.appt_id = a.id AND e.doctor = a.doctor) "
+            "ORDER BY id"
+        )
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('change_feed', '1')")
 
+def _query(sql, params=()):
+    with _db() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+@telemetry.timed("appointments.request_appointment")
 def request_appointment(patient, doctor, condition):
-    init_appointments_db()
-    df = pd.read_csv(APPOINTMENTS_FILE)
-    
-    new_id = len(df) + 1
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    new_row = pd.DataFrame([{
-        "id": new_id,
-        "patient": patient,
-        "doctor": doctor,
-        "condition": condition,
-        "status": "Pending",
-        "timestamp": timestamp
-    }])
-    
-    df = pd.concat([df, new_row], ignore_index=True)
-    df.to_csv(APPOINTMENTS_FILE, index=False)
+
+    with _db() as conn, conn:
+        conn.execute(
+            "INSERT INTO appointments (patient, doctor, condition, status, timestamp) VALUES (?, ?, ?, 'Pending', ?)",
+            (patient, doctor, condition, timestamp),
+        )
     return True
 
+@telemetry.timed("appointments.get_doctor_appointments")
 def get_doctor_appointments(doctor_name):
-    init_appointments_db()
-    df = pd.read_csv(APPOINTMENTS_FILE)
-    # Return appointments for this doctor
-    return df[df['doctor'] == doctor_name].sort_values(by="id", ascending=False)
+    # Return appointments for this doctor (uses idx_appointments_doctor)
+    return _query(f"SELECT {', '.join(COLUMNS)} FROM appointments WHERE doctor = ? ORDER BY id DESC", (doctor_name,))
+
+@telemetry.timed("appointments.get_doctor_version")
+def get_doctor_version(doctor_name):
+    """Change-feed position for this doctor: grows on every change to their appointments."""
+    with _db() as conn:
+        row = conn.execute("SELECT MAX(seq) FROM appointment_events WHERE doctor = ?", (doctor_name,)).fetchone()
+    return row[0] or 0
+
+@telemetry.timed("appointments.get_doctor_changes")
+def get_doctor_changes(doctor_name, since=0):
+    """
+    Appointments of this doctor changed after feed position `since`.
+    Returns (version, changed rows, ids of removed appointments), read as one snapshot.
+    """
+    with _db() as conn:
+        conn.execute("BEGIN") # One read snapshot for all three queries
+        try:
+            version = conn.execute("SELECT MAX(seq) FROM appointment_events WHERE doctor = ?", (doctor_name,)).fetchone()[0] or 0
+            changed = pd.read_sql_query(
+                f"SELECT {', '.join(COLUMNS)} FROM appointments WHERE doctor = ? AND id IN "
+                "(SELECT appt_id FROM appointment_events WHERE doctor = ? AND seq > ? AND op = 'upsert') ORDER BY id DESC",
+                conn, params=(doctor_name, doctor_name, since),
+            )
+            removed = [r[0] for r in conn.execute(
+                "SELECT appt_id FROM appointment_events WHERE doctor = ? AND seq > ? AND op = 'delete'",
+                (doctor_name, since),
+            )]
+        finally:
+            conn.commit()
+    return version, changed, removed
+
+@telemetry.timed("appointments.sync_doctor_appointments")
+def sync_doctor_appointments(doctor_name, feed=None):
+    """
+    Keeps a doctor's appointment list up to date from the change feed.
+    `feed` is the dict returned by the previous call (None the first time); it
+    is returned unchanged when nothing changed, else a new one with the
+    changed rows merged in. feed["frame"] matches get_doctor_appointments.
+    """
+    if feed is None or feed["doctor"] != doctor_name:
+        version, frame, _ = get_doctor_changes(doctor_name)
+        return {"doctor": doctor_name, "version": version, "frame": frame}
 
+    if get_doctor_version(doctor_name) == feed["version"]: return feed
+
+    version, changed, removed = get_doctor_changes(doctor_name, feed["version"])
+    frame = feed["frame"]
+    stale = frame['id'].isin(set(removed) | set(changed['id']))
+    frame = pd.concat([frame[~stale], changed], ignore_index=True) if len(changed) else frame[~stale]
+    frame = frame.sort_values('id', ascending=False, ignore_index=True)
+    return {"doctor": doctor_name, "version": version, "frame": frame}
+
+@telemetry.timed("appointments.get_patient_appointments")
 def get_patient_appointments(patient_name):
     """FETCH: Returns all appointments for a specific patient."""
-    init_appointments_db()
-    df = pd.read_csv(APPOINTMENTS_FILE)
-    return df[df['patient'] == patient_name].sort_values(by="id", ascending=False)
+    return _query(f"SELECT {', '.join(COLUMNS)} FROM appointments WHERE patient = ? ORDER BY id DESC", (patient_name,))
 
+@telemetry.timed("appointments.update_status")
 def update_status(appt_id, new_status):
-    df = pd.read_csv(APPOINTMENTS_FILE)
-    df.loc[df['id'] == appt_id, 'status'] = new_status
-    df.to_csv(APPOINTMENTS_FILE, index=False)
+    with _db() as conn, conn:
+        conn.execute("UPDATE appointments SET status = ? WHERE id = ?", (new_status, int(appt_id)))
 
+@telemetry.timed("appointments.delete_appointment")
 def delete_appointment(appt_id):
     """DELETE: Removes an appointment permanently."""
-    if not os.path.exists(APPOINTMENTS_FILE): return
-    df = pd.read_csv(APPOINTMENTS_FILE)
-    
-    # Filter out the row with the matching ID
-    df = df[df['id'] != appt_id]
-    
-    df.to_csv(APPOINTMENTS_FILE, index=False)
\ No newline at end of file
+    with _db() as conn, conn:
+        conn.execute("DELETE FROM appointments WHERE id = ?", (int(appt_id),))
+
+# -----------------------------------------------------------------------------
+# BULK ACTIONS: a whole selection in one write transaction
+# -----------------------------------------------------------------------------
+def _ids(appt_ids):
+    return [(int(i),) for i in dict.fromkeys(appt_ids)]
+
+@telemetry.timed("appointments.update_statuses")
+def update_statuses(appt_ids, new_status):
+    """Sets the status of all these appointments at once. Returns how many rows changed."""
+    rows = _ids(appt_ids)
+    if not rows: return 0
+    with _db() as conn, conn:
+        return conn.executemany("UPDATE appointments SET status = ? WHERE id = ?",
+                                [(new_status, i) for (i,) in rows]).rowcount
+
+@telemetry.timed("appointments.delete_appointments")
+def delete_appointments(appt_ids):
+    """Removes all these appointments at once. Returns how many rows were deleted."""
+    rows = _ids(appt_ids)
+    if not rows: return 0
+    with _db() as conn, conn:
+        return conn.executemany("DELETE FROM appointments WHERE id = ?", rows).rowcount
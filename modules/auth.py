@@ -2,58 +2,146 @@ import streamlit as st
 import pandas as pd
 import bcrypt
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules import datastore, telemetry
 
 USERS_FILE = "users.csv"
 
+# bcrypt cost factor for new hashes (4-31). Each +1 doubles hashing/login time.
+BCRYPT_ROUNDS = int(os.environ.get("SAMHATI_BCRYPT_ROUNDS", 12))
+# Max bcrypt computations running at once; extra logins queue instead of thrashing the CPU
+BCRYPT_WORKERS = int(os.environ.get("SAMHATI_BCRYPT_WORKERS", os.cpu_count() or 2))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# username -> user record, rebuilt whenever the users table version changes
+_user_index = {"version": None, "users": {}}
+_user_index_lock = threading.Lock()
+
+# -----------------------------------------------------------------------------
+# PASSWORD HASHING (bounded worker pool; bcrypt releases the GIL while it runs)
+# The pool caps how many hashes run at once across all sessions. A caller that
+# waits on .result() right away still takes one full bcrypt computation (plus
+# any queueing): the pool bounds CPU use under load, it doesn't cut latency.
+# -----------------------------------------------------------------------------
+def hash_password_async(password, rounds=None):
+    """Returns a Future with the bcrypt hash of `password`."""
+    rounds = rounds or BCRYPT_ROUNDS
+    return _bcrypt_pool.submit(
+        lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    )
+
+def check_password_async(password, stored_hash):
+    """Returns a Future that resolves to True if `password` matches `stored_hash`."""
+    return _bcrypt_pool.submit(bcrypt.checkpw, password.encode('utf-8'), stored_hash.encode('utf-8'))
+
+def _hash_rounds(stored_hash):
+    try:
+        return int(stored_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+# -----------------------------------------------------------------------------
+# USER TABLE
+# -----------------------------------------------------------------------------
+def _default_users():
+    df = pd.DataFrame(columns=["username", "password", "role"])
+    # Create a default admin account
+    # Password is 'admin123'
+    hashed_pw = hash_password_async("admin123").result()
+
+    # Using pd.concat instead of append (deprecated)
+    new_row = pd.DataFrame([{"username": "admin", "password": hashed_pw, "role": "admin"}])
+    return pd.concat([df, new_row], ignore_index=True)
+
 def init_users_db():
     """Creates the users.csv file if it doesn't exist."""
-    if not os.path.exists(USERS_FILE):
-        df = pd.DataFrame(columns=["username", "password", "role"])
-        # Create a default admin account
-        # Password is 'admin123'
-        hashed_pw = bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        
-        # Using pd.concat instead of append (deprecated)
-        new_row = pd.DataFrame([{"username": "admin", "password": hashed_pw, "role": "admin"}])
-        df = pd.concat([df, new_row], ignore_index=True)
-        
-        df.to_csv(USERS_FILE, index=False)
+    datastore.read_table(USERS_FILE, init=_default_users)
 
 def load_users():
-    """Loads the users database."""
-    if not os.path.exists(USERS_FILE):
-        init_users_db()
-    return pd.read_csv(USERS_FILE)
+    """Loads the users database (shared in-memory copy, do not modify)."""
+    return datastore.read_table(USERS_FILE, init=_default_users)
+
+def _user_stats(users):
+    return {"users": len(users), "roles": users['role'].value_counts().to_dict()}
+
+def user_stats():
+    """Total users and users per role (recomputed only after the users table changes)."""
+    return datastore.aggregates(USERS_FILE, _user_stats, init=_default_users)
 
+@telemetry.timed("auth.get_users_page")
+def get_users_page(page=0, page_size=50, query=None):
+    """One page of users, filtered by username/role. Returns (rows, total matching)."""
+    return datastore.read_page(USERS_FILE, page, page_size, query, columns=["username", "role"], init=_default_users)
+
+def _get_user(username):
+    """O(1) lookup of a user record (or None) through the username index."""
+    global _user_index
+    version = datastore.table_version(USERS_FILE, init=_default_users)
+    index = _user_index
+    if index["version"] != version:
+        with _user_index_lock:
+            index = _user_index
+            if index["version"] != version:
+                users = {}
+                for record in load_users().to_dict('records'):
+                    # First row wins, like the old users[...].iloc[0] lookup
+                    users.setdefault(str(record['username']), record)
+                index = {"version": version, "users": users}
+                _user_index = index
+    return index["users"].get(str(username))
+
+@telemetry.timed("auth.signup_user")
 def signup_user(username, password, role="patient"):
-    """Registers a new user."""
-    users = load_users()
-    
-    if username in users['username'].values:
+    """Registers a new user. Blocks for one bcrypt hash (run on the bounded pool)."""
+    if _get_user(username) is not None:
         return False, "Username already exists!"
-    
+
     # Hash the password
-    hashed_pw = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    
+    hashed_pw = hash_password_async(password).result()
+
     new_user = pd.DataFrame([{"username": username, "password": hashed_pw, "role": role}])
-    users = pd.concat([users, new_user], ignore_index=True)
-    users.to_csv(USERS_FILE, index=False)
-    
+
+    def add_user(users):
+        # Re-checked here: the table may have changed since the check above
+        if str(username) in users['username'].astype(str).values: return None
+        return pd.concat([users, new_user], ignore_index=True)
+
+    if not datastore.update_table(USERS_FILE, add_user, init=_default_users):
+        return False, "Username already exists!"
+
     return True, "Account created successfully! Please login."
 
+@telemetry.timed("auth.login_user")
 def login_user(username, password):
-    """Verifies credentials."""
-    users = load_users()
-    
-    user_row = users[users['username'] == username]
-    
-    if user_row.empty:
+    """Verifies credentials. Blocks for one bcrypt check (run on the bounded pool)."""
+    user = _get_user(username)
+
+    if user is None:
         return None, "User not found."
-    
-    stored_hash = user_row.iloc[0]['password']
-    
+
+    stored_hash = user['password']
+
     # Verify password
-    if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
-        return user_row.iloc[0].to_dict(), "Success"
+    if check_password_async(password, stored_hash).result():
+        if _hash_rounds(stored_hash) != BCRYPT_ROUNDS:
+            _rehash_in_background(user['username'], password)
+        return dict(user), "Success"
     else:
-        return None, "Incorrect password."
\ No newline at end of file
+        return None, "Incorrect password."
+
+def _rehash_in_background(username, password):
+    """Upgrades a stored hash to the configured cost factor after a successful login."""
+    def store(future):
+        if future.exception() is not None: return
+        hashed_pw = future.result()
+
+        def set_hash(users):
+            users = users.copy()
+            users.loc[users['username'] == username, 'password'] = hashed_pw
+            return users
+
+        datastore.update_table(USERS_FILE, set_hash)
+
+    hash_password_async(password).add_done_callback(store)
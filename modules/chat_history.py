@@ -0,0 +1,91 @@
+import os
+
+# -----------------------------------------------------------------------------
+# Bounded chat history for one session.
+# At most HISTORY_CAP messages are kept verbatim. Beyond that the oldest ones are
+# compacted into a small summary (conditions asked about + the last questions),
+# which is still passed to the LLM as context. Messages are addressed by their
+# absolute number in the conversation, so numbers stay valid after compaction.
+# -----------------------------------------------------------------------------
+HISTORY_CAP = max(int(os.environ.get("SAMHATI_CHAT_HISTORY", 60)), 8) # Messages kept verbatim
+SUMMARY_TOPICS = 8     # Conditions remembered in the summary
+SUMMARY_QUESTIONS = 3  # Compacted user questions quoted in the summary
+QUESTION_CHARS = 80
+
+def new_history():
+    return {
+        "messages": [], # {"role", "content"} (+ "condition" for user turns)
+        "start": 0,     # Absolute number of messages[0]
+        "summary": {"messages": 0, "topics": [], "questions": []},
+    }
+
+def size(history):
+    """Messages in the whole conversation, compacted ones included."""
+    return history["start"] + len(history["messages"])
+
+def append(history, role, content, condition=None):
+    """Adds a message and returns its number."""
+    msg = {"role": role, "content": content}
+    if condition is not None: msg["condition"] = condition
+    history["messages"].append(msg)
+    if len(history["messages"]) > HISTORY_CAP: _compact(history)
+    return size(history) - 1
+
+def get(history, number):
+    """The message with this number, or None once it has been compacted."""
+    i = number - history["start"]
+    return history["messages"][i] if 0 <= i < len(history["messages"]) else None
+
+def set_content(history, number, content):
+    msg = get(history, number)
+    if msg is not None: msg["content"] = content
+
+def _compact(history):
+    """Folds the older half of the kept messages into the summary (amortized O(1) per append)."""
+    keep = HISTORY_CAP // 2
+    old, history["messages"] = history["messages"][:-keep], history["messages"][-keep:]
+    history["start"] += len(old)
+
+    summary = history["summary"]
+    topics, questions = list(summary["topics"]), list(summary["questions"])
+    for msg in old:
+        if msg["role"] != "user": continue
+        condition = msg.get("condition")
+        if condition and condition != "General":
+            if condition in topics: topics.remove(condition)
+            topics.append(condition)
+        text = " ".join(str(msg["content"]).split())
+        questions.append(text if len(text) <= QUESTION_CHARS else text[:QUESTION_CHARS - 1] + "…")
+    history["summary"] = {
+        "messages": summary["messages"] + len(old),
+        "topics": topics[-SUMMARY_TOPICS:],
+        "questions": questions[-SUMMARY_QUESTIONS:],
+    }
+
+def summary_text(history):
+    """One paragraph about the compacted part of the conversation ("" if nothing was compacted)."""
+    summary = history["summary"]
+    if not summary["messages"]: return ""
+    parts = [f"{summary['messages']} earlier messages were summarized."]
+    if summary["topics"]: parts.append("The user asked about: " + ", ".join(summary["topics"]) + ".")
+    if summary["questions"]: parts.append("Their last earlier questions: " + " | ".join(summary["questions"]))
+    return " ".join(parts)
+
+def context(history, n=4):
+    """LLM context: the summary (as a system message) + the last n messages, role and content only."""
+    messages = [{"role": m["role"], "content": m["content"]} for m in history["messages"][-n:]] if n else []
+    text = summary_text(history)
+    if text: messages.insert(0, {"role": "system", "content": f"EARLIER CONVERSATION: {text}"})
+    return messages
+
+def page(history, page=0, page_size=20):
+    """
+    (number, message) pairs of one page, oldest first; page 0 = the latest
+    messages. Also returns how many pages the kept messages fill.
+    """
+    messages = history["messages"]
+    pages = max(1, -(-len(messages) // page_size))
+    page = min(max(page, 0), pages - 1)
+    end = len(messages) - page * page_size
+    begin = max(0, end - page_size)
+    return [(history["start"] + i, messages[i]) for i in range(begin, end)], pages
@@ -1,19 +1,76 @@
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient
 import streamlit as st
+import httpx
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules import response_cache, telemetry, condition_matcher, chat_history as history_store
 
-ENDPOINT = "https://models.inference.ai.azure.com"
+# Override with SAMHATI_LLM_ENDPOINT, e.g. to point at benchmarks/llm_stub.py
+ENDPOINT = os.environ.get("SAMHATI_LLM_ENDPOINT", "https://models.inference.ai.azure.com")
 MODEL_NAME = "gpt-4o" 
 
-def _generate_offline_response(recommended_drugs_df):
+# Network budget per request (seconds) and retries on connection errors / 429 / 5xx
+CONNECT_TIMEOUT = float(os.environ.get("SAMHATI_LLM_CONNECT_TIMEOUT", 5))
+REQUEST_TIMEOUT = float(os.environ.get("SAMHATI_LLM_TIMEOUT", 30))
+MAX_RETRIES = int(os.environ.get("SAMHATI_LLM_RETRIES", 2))
+# Idle keep-alive connections kept open to the endpoint, and for how long
+KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+
+# Pipeline mode: the chat shows the offline answer at once and the LLM reply
+# arrives from a background worker, given up after REPLY_DEADLINE seconds
+PIPELINE_MODE = os.environ.get("SAMHATI_CHAT_PIPELINE", "1") != "0"
+REPLY_DEADLINE = float(os.environ.get("SAMHATI_LLM_DEADLINE", 45))
+REPLY_WORKERS = int(os.environ.get("SAMHATI_LLM_WORKERS", 8))
+
+# Short queries that just name a condition ("acne", "pet dukh raha hai") get the
+# database answer without an LLM call; 0 always asks the LLM
+DIRECT_ANSWER_WORDS = int(os.environ.get("SAMHATI_DIRECT_ANSWER_WORDS", 6))
+
+INTERRUPTED_NOTE = "\n\n*(Connection interrupted. The answer above may be incomplete.)*"
+
+_reply_pool = ThreadPoolExecutor(max_workers=REPLY_WORKERS, thread_name_prefix="llm-reply")
+
+# One client per (endpoint, API key) for the whole process: reuses TCP/TLS connections across turns
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_client(api_key):
+    key = (ENDPOINT, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    base_url=ENDPOINT,
+                    api_key=api_key,
+                    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                    max_retries=MAX_RETRIES,
+                    http_client=DefaultHttpxClient(limits=httpx.Limits(
+                        max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    )),
+                )
+                _clients[key] = client
+    return client
+
+def _generate_offline_response(recommended_drugs_df, direct=False, pending=False):
     """
-    Internal Helper: Generates a template response when AI is unavailable.
+    Internal Helper: Generates a template response when AI is unavailable
+    (or not needed: direct=True for a query that just names a condition;
+    pending=True while the AI reply is still on its way).
     Now handles 'General' greetings gracefully.
     """
     if recommended_drugs_df.empty:
         # This handles greetings (Hi, Hello) or unrecognized symptoms in offline mode
+        status = ("The **AI assistant** is writing a reply." if pending
+                  else "I am currently in **Offline Mode** (Database Only).")
         return (
             "👋 **Hello!**\n\n"
-            "I am currently in **Offline Mode** (Database Only).\n"
+            f"{status}\n"
             "I can recommend drugs if you type a symptom like:\n"
             "- *'I have a headache'*\n"
             "- *'Best medicine for acne'*\n\n"
@@ -22,30 +79,44 @@ def _generate_offline_response(recommended_drugs_df):
 
     # Extract top drug details
     top_drug = recommended_drugs_df.iloc[0]
+    if direct: note = "*(Direct match on a condition name: answered from the drug database.)*"
+    elif pending: note = "*(Database results first; the AI assistant's reply is on its way.)*"
+    else: note = "*(Note: AI Chat is currently offline. Showing direct database results.)*"
     
     return (
-        f"**✅ Database Match (Offline Mode):**\n\n"
+        f"**✅ Database Match{'' if direct or pending else ' (Offline Mode)'}:**\n\n"
         f"Based on your symptoms, the system detected: **{top_drug['medical_condition']}**.\n\n"
         f"**Top Recommended Drug:**\n"
         f"💊 **{top_drug['drug_name']}**\n"
         f"⭐ **Rating:** {top_drug['rating']}/10\n"
         f"👥 **Reviews:** {top_drug['no_of_reviews']:.0f} users\n\n"
         f"⚠️ **Side Effects:** {str(top_drug['side_effects'])[:120]}...\n\n"
-        f"*(Note: AI Chat is currently offline. Showing direct database results.)*"
+        f"{note}"
     )
 
-def get_ai_response(api_key, user_input, recommended_drugs_df, chat_history):
+def _cache_bucket(condition, recommended_drugs_df, chat_history):
+    if condition is None:
+        condition = recommended_drugs_df.iloc[0]['medical_condition'] if not recommended_drugs_df.empty else "General"
+    # The same question after different turns may need a different answer
+    return response_cache.make_bucket(condition, recommended_drugs_df, _history_messages(chat_history))
+
+def _is_direct(user_input, recommended_drugs_df, condition=None):
     """
-    Main Logic: Tries to use GPT-4o. If token is missing or API fails, falls back to Offline Template.
+    True if the query only names a condition and the recommendations are for
+    that very condition: the offline answer is the answer.
     """
-    
-    # 1. CHECK TOKEN: If invalid/placeholder, skip straight to offline mode
-    if not api_key or "PASTE" in api_key or len(api_key) < 10:
-        return _generate_offline_response(recommended_drugs_df)
+    if not DIRECT_ANSWER_WORDS or recommended_drugs_df.empty: return False
+    named = condition_matcher.match(user_input, DIRECT_ANSWER_WORDS)
+    if named is None: return False
+    if condition is not None and str(condition) != named: return False
+    if str(recommended_drugs_df.iloc[0]['medical_condition']) != named: return False
+    telemetry.event("chatbot.direct_answer")
+    return True
 
-    # 2. PREPARE ONLINE CONTEXT
-    client = OpenAI(base_url=ENDPOINT, api_key=api_key)
+def _has_valid_token(api_key):
+    return bool(api_key) and "PASTE" not in api_key and len(api_key) >= 10
 
+def _build_messages(user_input, recommended_drugs_df, chat_history):
     system_instruction = """
     You are PharmaConnect, a helpful medical assistant.
     RULES:
@@ -67,19 +138,192 @@ def get_ai_response(api_key, user_input, recommended_drugs_df, chat_history):
         context_text = f"{system_instruction}\n\nINSTRUCTION: No specific drugs found in database. If the user said 'Hi/Hello', greet them warmly and ask for their symptoms. If it was a medical query, provide general advice and suggest a doctor."
 
     messages = [{"role": "system", "content": context_text}]
-    messages.extend(chat_history[-4:]) # Keep last 4 messages for context
+    messages.extend(_history_messages(chat_history))
     messages.append({"role": "user", "content": user_input})
+    return messages
+
+def _history_messages(chat_history):
+    """The prior turns sent to the LLM with a question."""
+    if isinstance(chat_history, dict): # History store: summary of compacted turns + last 4 messages
+        return history_store.context(chat_history, 4)
+    return list(chat_history[-4:]) # Keep last 4 messages for context
+
+@telemetry.timed("chatbot.get_ai_response")
+def get_ai_response(api_key, user_input, recommended_drugs_df, chat_history, condition=None, use_cache=True):
+    """
+    Main Logic: Tries to use GPT-4o. If token is missing or API fails, falls back to Offline Template.
+    Replies are cached per (condition, recommended drugs, similar question); use_cache=False bypasses it.
+    """
+    
+    # 0. DIRECT ANSWER: the query just names the condition the drugs are for
+    if _is_direct(user_input, recommended_drugs_df, condition):
+        return _generate_offline_response(recommended_drugs_df, direct=True)
+
+    # 1. CHECK TOKEN: If invalid/placeholder, skip straight to offline mode
+    if not _has_valid_token(api_key):
+        telemetry.event("chatbot.fallback", reason="no_token")
+        return _generate_offline_response(recommended_drugs_df)
+
+    use_cache = use_cache and response_cache.ENABLED
+    if use_cache:
+        bucket = _cache_bucket(condition, recommended_drugs_df, chat_history)
+        cached = response_cache.get(bucket, user_input)
+        if cached is not None: return cached
+
+    # 2. PREPARE ONLINE CONTEXT
+    messages = _build_messages(user_input, recommended_drugs_df, chat_history)
 
     # 3. ATTEMPT API CALL
     try:
-        response = client.chat.completions.create(
+        response = _get_client(api_key).chat.completions.create(
             model=MODEL_NAME,
             messages=messages,
             temperature=0.6,
         )
-        return response.choices[0].message.content
+        reply = response.choices[0].message.content
+        if use_cache and reply: response_cache.put(bucket, user_input, reply)
+        return reply
 
     except Exception as e:
         # 4. FALLBACK: If API fails (Network error, Quota exceeded, or Bad Token), use Offline Mode
         print(f"⚠️ API Error (Falling back to offline): {e}")
-        return _generate_offline_response(recommended_drugs_df)
\ No newline at end of file
+        telemetry.event("chatbot.fallback", reason=type(e).__name__)
+        return _generate_offline_response(recommended_drugs_df)
+
+def stream_ai_response(api_key, user_input, recommended_drugs_df, chat_history, condition=None, use_cache=True):
+    """
+    Streaming variant of get_ai_response: yields the reply in pieces as the
+    tokens arrive. Falls back to the Offline Template and uses the cache the same way.
+    """
+    if _is_direct(user_input, recommended_drugs_df, condition):
+        yield _generate_offline_response(recommended_drugs_df, direct=True)
+        return
+    if not _has_valid_token(api_key):
+        telemetry.event("chatbot.fallback", reason="no_token")
+        yield _generate_offline_response(recommended_drugs_df)
+        return
+
+    use_cache = use_cache and response_cache.ENABLED
+    if use_cache:
+        bucket = _cache_bucket(condition, recommended_drugs_df, chat_history)
+        cached = response_cache.get(bucket, user_input)
+        if cached is not None:
+            yield cached
+            return
+
+    messages = _build_messages(user_input, recommended_drugs_df, chat_history)
+
+    streamed = []
+    try:
+        for token in _stream_tokens(api_key, messages):
+            streamed.append(token)
+            yield token
+
+        if use_cache and streamed: response_cache.put(bucket, user_input, "".join(streamed))
+
+    except Exception as e:
+        print(f"⚠️ API Error (Falling back to offline): {e}")
+        telemetry.event("chatbot.fallback", reason=type(e).__name__, streamed=bool(streamed))
+        if not streamed:
+            yield _generate_offline_response(recommended_drugs_df)
+        else:
+            # Keep what the user already read; just flag the cut-off
+            yield INTERRUPTED_NOTE
+
+def _stream_tokens(api_key, messages):
+    """Yields the reply tokens from the API. Raises on any API/network error."""
+    with _get_client(api_key).chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=0.6,
+        stream=True,
+    ) as stream:
+        for chunk in stream:
+            if not chunk.choices: continue
+            token = chunk.choices[0].delta.content
+            if token: yield token
+
+# -----------------------------------------------------------------------------
+# PIPELINE MODE (offline answer first, LLM reply from a background worker)
+# -----------------------------------------------------------------------------
+def start_ai_response(api_key, user_input, recommended_drugs_df, chat_history, condition=None, use_cache=True):
+    """
+    Returns at once with a reply job: the database answer is ready immediately
+    (job["placeholder"] while the reply is pending) and the LLM reply is fetched
+    on a background worker. Read it with poll_ai_response.
+    """
+    direct = _is_direct(user_input, recommended_drugs_df, condition)
+    offline = _generate_offline_response(recommended_drugs_df, direct)
+    job = {
+        "offline": offline,     # Final answer when there is no LLM reply
+        "placeholder": offline, # Shown until the first token arrives
+        "parts": [],
+        "state": "pending", # pending -> streaming -> done | failed; "offline" if no LLM call
+        "cancelled": False,
+        "deadline": time.monotonic() + REPLY_DEADLINE,
+    }
+    if direct:
+        job["state"] = "offline"
+        return job
+    if not _has_valid_token(api_key):
+        telemetry.event("chatbot.fallback", reason="no_token")
+        job["state"] = "offline"
+        return job
+
+    bucket = None
+    if use_cache and response_cache.ENABLED:
+        bucket = _cache_bucket(condition, recommended_drugs_df, chat_history)
+        cached = response_cache.get(bucket, user_input)
+        if cached is not None:
+            job["parts"].append(cached)
+            job["state"] = "done"
+            return job
+
+    messages = _build_messages(user_input, recommended_drugs_df, chat_history)
+    job["placeholder"] = _generate_offline_response(recommended_drugs_df, pending=True)
+    _reply_pool.submit(_run_reply_job, job, api_key, messages, bucket, user_input)
+    return job
+
+@telemetry.timed("chatbot.reply_job")
+def _run_reply_job(job, api_key, messages, bucket, user_input):
+    """
+    Streams the reply into the job. Stops (closing the stream) at the first token
+    after the job is cancelled or past its deadline; a worker blocked waiting for
+    a token only notices at that token or when REQUEST_TIMEOUT ends the read.
+    """
+    try:
+        for token in _stream_tokens(api_key, messages):
+            if job["cancelled"] or time.monotonic() > job["deadline"]: return # Nobody is waiting any more
+            job["parts"].append(token)
+            job["state"] = "streaming"
+
+        if bucket is not None and job["parts"]: response_cache.put(bucket, user_input, "".join(job["parts"]))
+        job["state"] = "done"
+
+    except Exception as e:
+        print(f"⚠️ API Error (Falling back to offline): {e}")
+        telemetry.event("chatbot.fallback", reason=type(e).__name__, streamed=bool(job["parts"]))
+        job["state"] = "failed"
+
+def poll_ai_response(job):
+    """
+    Current text of a reply job and whether it is final. Shows the placeholder
+    until the first token arrives, and the offline answer if the call fails or
+    times out with nothing streamed.
+    """
+    text = "".join(job["parts"])
+    state = job["state"]
+    if state == "done":
+        return text or job["offline"], True
+    if state in ("offline", "failed") or time.monotonic() > job["deadline"]:
+        if state in ("pending", "streaming") and not job["cancelled"]:
+            reason = "cancelled" if job["deadline"] == 0 else "deadline"
+            telemetry.event("chatbot.fallback", reason=reason, streamed=bool(text))
+        job["cancelled"] = True
+        return (text + INTERRUPTED_NOTE) if text else job["offline"], True
+    return text or job["placeholder"], False
+
+def cancel_ai_response(job):
+    """Stops waiting for a reply job and returns its final text."""
+    job["deadline"] = 0
+    return poll_ai_response(job)[0]
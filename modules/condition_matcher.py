@@ -0,0 +1,167 @@
+import re
+import threading
+from collections import deque
+from modules import model
+
+# -----------------------------------------------------------------------------
+# Fast path in front of the SVM: condition names from the drugs dataset plus the
+# synonym / transliteration table below, compiled into one Aho-Corasick
+# automaton over words. One left-to-right pass over the query finds every
+# phrase it contains; overlapping hits resolve to the leftmost-longest one.
+# -----------------------------------------------------------------------------
+DRUGS_FILE = "drugs.csv"
+
+# Dataset condition -> everyday / Hinglish phrases for it. Phrases are matched
+# as whole words, case-insensitively, apostrophes ignored ("can't" = "cant").
+# A phrase listed under several conditions goes to the first one that exists in
+# the dataset; conditions missing from the dataset are skipped.
+SYNONYMS = {
+    "Acne": ["acne", "pimple", "pimples", "zits", "muhase", "muhaase", "mahase"],
+    "ADHD": ["attention deficit", "hyperactivity"],
+    "AIDS/HIV": ["hiv"],
+    "Allergies": ["allergy", "allergic", "allergic reaction"],
+    "Alzheimer's": ["alzheimer", "alzheimers", "dementia"],
+    "Anxiety": ["anxious", "panic attack", "panic attacks", "ghabrahat", "bechaini"],
+    "Asthma": ["dama", "saans phoolna", "saans phool"],
+    "Bipolar Disorder": ["bipolar", "manic depression"],
+    "Cholesterol": ["high cholesterol", "cholestrol"],
+    "Colds & Flu": ["cold", "common cold", "flu", "cough", "runny nose", "blocked nose",
+                    "zukam", "jukam", "nazla", "sardi", "khansi"],
+    "Constipation": ["constipated", "kabz", "kabj", "qabz"],
+    "COPD": ["emphysema"],
+    "COVID 19": ["covid", "covid19", "corona", "coronavirus"],
+    "Depression": ["depressed"],
+    "Diabetes (Type 2)": ["diabetes", "type 2 diabetes", "high blood sugar", "sugar ki bimari", "madhumeh"],
+    "Diabetes (Type 1)": ["diabetes", "type 1 diabetes"],
+    "Diarrhea": ["diarrhoea", "loose motion", "loose motions", "dast", "pet kharab"],
+    "Eczema": ["atopic dermatitis"],
+    "Erectile Dysfunction": ["impotence"],
+    "Gastrointestinal": ["stomach ache", "stomach pain", "pet dard", "pet dukh", "pet mein dard"],
+    "GERD (Heartburn)": ["gerd", "heartburn", "acid reflux", "acidity", "seene mein jalan", "khatti dakar"],
+    "Hair Loss": ["hair fall", "baal jhad", "baal jhadna", "baal gir", "baldness"],
+    "Hayfever": ["hay fever", "allergic rhinitis"],
+    "Herpes": ["cold sore", "cold sores"],
+    "Hypertension": ["high blood pressure", "high bp", "bp high"],
+    "Hypothyroidism": ["underactive thyroid"],
+    "IBD (Bowel)": ["ibd", "crohns", "ulcerative colitis"],
+    "Insomnia": ["cant sleep", "cannot sleep", "sleeplessness", "neend nahi", "neend nahi aati"],
+    "Menopause": ["hot flashes"],
+    "Migraine": ["migraines", "headache", "sir dard", "sar dard", "sir mein dard"],
+    "Osteoarthritis": ["joint pain", "jodon ka dard", "ghutno mein dard"],
+    "Pain": ["back pain", "kamar dard", "dard", "stomach ache", "pet dard", "pet dukh"],
+    "Seizures": ["seizure", "epilepsy", "mirgi"],
+    "Swine Flu": ["h1n1"],
+    "UTI": ["urine infection", "urinary tract infection", "peshab mein jalan"],
+    "Weight Loss": ["lose weight", "obesity", "motapa"],
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_automaton = None
+_lock = threading.Lock()
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower().replace("'", ""))
+
+def build(conditions, synonyms=SYNONYMS):
+    """Automaton for these dataset condition names (+ their synonyms)."""
+    names = [str(c) for c in dict.fromkeys(conditions)]
+    known = {name.lower(): name for name in names}
+    patterns = {} # word tuple -> condition; first writer wins
+    for name in names:
+        patterns.setdefault(tuple(_tokens(name)), name)
+    for condition, phrases in synonyms.items():
+        target = known.get(condition.lower())
+        if target is None: continue
+        for phrase in phrases:
+            patterns.setdefault(tuple(_tokens(phrase)), target)
+    patterns.pop((), None)
+
+    # Trie: goto[node] = {word: child}, out[node] = [(word count, condition)] ending there
+    goto, out = [{}], [[]]
+    for words, condition in patterns.items():
+        node = 0
+        for word in words:
+            if word not in goto[node]:
+                goto.append({})
+                out.append([])
+                goto[node][word] = len(goto) - 1
+            node = goto[node][word]
+        out[node].append((len(words), condition))
+
+    # Failure links (breadth first); every node also reports its suffix matches
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for word, child in goto[node].items():
+            state = fail[node]
+            while state and word not in goto[state]: state = fail[state]
+            fail[child] = goto[state].get(word, 0)
+            out[child] = out[child] + out[fail[child]]
+            queue.append(child)
+    return {"goto": goto, "fail": fail, "out": out, "patterns": len(patterns)}
+
+def load(conditions=None):
+    """
+    (Re)builds the shared automaton from these condition names (kept as is), or
+    from the conditions in DRUGS_FILE (rebuilt whenever that file changes). Returns it.
+    """
+    global _automaton
+    if conditions is not None:
+        source = "given"
+    else:
+        # Same file identity as model.load_data uses for its recommendation index
+        source = (DRUGS_FILE, model._source_stamp(DRUGS_FILE))
+        conditions = []
+        if source[1] is not None: # Missing file: no keywords yet, and no Streamlit error from load_data
+            df = model.load_data(DRUGS_FILE)
+            if 'medical_condition' in df.columns: conditions = df['medical_condition'].dropna().unique()
+    automaton = build(conditions)
+    automaton["source"] = source
+    with _lock:
+        _automaton = automaton
+    return automaton
+
+def _get():
+    """The shared automaton, built on first use and after DRUGS_FILE changed (a racing second build is harmless)."""
+    automaton = _automaton
+    if automaton is not None:
+        if automaton["source"] == "given": return automaton
+        if automaton["source"] == (DRUGS_FILE, model._source_stamp(DRUGS_FILE)): return automaton
+    return load()
+
+def find(text, automaton=None):
+    """
+    Condition phrases in the text as (first word, end word, condition),
+    left to right, without overlaps (the longest phrase wins).
+    """
+    automaton = automaton or _get()
+    goto, fail, out = automaton["goto"], automaton["fail"], automaton["out"]
+    root = goto[0]
+
+    hits = []
+    state = 0
+    for i, word in enumerate(_tokens(text)):
+        if state == 0 and word not in root: continue
+        while state and word not in goto[state]: state = fail[state]
+        state = goto[state].get(word, 0)
+        for length, condition in out[state]:
+            hits.append((i + 1 - length, i + 1, condition))
+
+    hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+    chosen, end = [], 0
+    for hit in hits:
+        if hit[0] >= end:
+            chosen.append(hit)
+            end = hit[1]
+    return chosen
+
+def match(text, max_words=None):
+    """
+    The condition the text names, or None if it names none or several. With
+    max_words, only texts of at most that many words count.
+    """
+    if max_words is not None and len(_tokens(text)) > max_words: return None
+    conditions = {condition for _, _, condition in find(text)}
+    return conditions.pop() if len(conditions) == 1 else None
@@ -0,0 +1,229 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import atexit
+import threading
+import contextlib
+import itertools
+from modules import telemetry
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# -----------------------------------------------------------------------------
+# Process-wide cache of the small CSV tables (users.csv, doctors.csv).
+# Reads are served from memory; writes are applied in memory right away and
+# flushed to disk in batches by a background thread (write-behind).
+# -----------------------------------------------------------------------------
+FLUSH_INTERVAL = 1.0  # Seconds between write-behind flushes
+CHECK_INTERVAL = 0.5  # Seconds between mtime checks for edits by other processes
+
+_tables = {}
+_tables_lock = threading.Lock()
+# Source of table versions: unique across all tables, so a cache keyed on a
+# version can never confuse two files (e.g. after USERS_FILE is repointed)
+_versions = itertools.count(1)
+_flusher = None
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Exclusive inter-process lock on <path>.lock while a table is written."""
+    with open(f"{path}.lock", "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _read_csv(path):
+    with telemetry.span("datastore.read_csv", file=os.path.basename(path)):
+        return pd.read_csv(path)
+
+def _write_csv(path, df):
+    """Atomic replace, so readers in other processes never see a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with telemetry.span("datastore.write_csv", file=os.path.basename(path)):
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+def _table(path, init=None):
+    key = os.path.abspath(path)
+    table = _tables.get(key)
+    if table is not None:
+        return table
+
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is None:
+            if not os.path.exists(path):
+                if init is None: raise FileNotFoundError(path)
+                with _file_lock(path):
+                    if not os.path.exists(path):
+                        _write_csv(path, init())
+            table = {
+                "path": path,
+                "frame": _read_csv(path),
+                "stamp": _stamp(path),
+                "checked": time.monotonic(),
+                "version": next(_versions), # Renewed on every change, for caches built on top of a table
+                "pending": [],  # Changes not yet flushed to disk
+                "lock": threading.RLock(),
+            }
+            _tables[key] = table
+    return table
+
+def _refresh(table):
+    """Reloads the table if another process replaced the file since we last looked."""
+    now = time.monotonic()
+    if now - table["checked"] < CHECK_INTERVAL: return
+    with table["lock"]:
+        table["checked"] = now
+        stamp = _stamp(table["path"])
+        # Pending local changes are merged with the new file contents on flush
+        if stamp is not None and stamp != table["stamp"] and not table["pending"]:
+            table["frame"] = _read_csv(table["path"])
+            table["stamp"] = stamp
+            table["version"] = next(_versions)
+
+def read_table(path, init=None):
+    """
+    Returns the in-memory copy of a CSV table (shared: treat it as read-only).
+    If the file is missing, `init()` provides the initial contents.
+    """
+    table = _table(path, init)
+    _refresh(table)
+    return table["frame"]
+
+def table_version(path, init=None):
+    """Counter that changes whenever the table's contents change."""
+    table = _table(path, init)
+    _refresh(table)
+    return table["version"]
+
+def snapshot(path, init=None):
+    """(frame, version) read together, for caches that must match one exact version."""
+    table = _table(path, init)
+    _refresh(table)
+    with table["lock"]:
+        return table["frame"], table["version"]
+
+def aggregates(path, compute, init=None):
+    """
+    `compute(frame) -> dict` of counts/sums for the table, kept per table
+    version: it runs once after each change instead of on every read.
+    Pass a module-level function (it is the cache key).
+    """
+    table = _table(path, init)
+    _refresh(table)
+    key = compute
+    cached = table.setdefault("aggregates", {}).get(key)
+    if cached is None or cached[0] != table["version"]:
+        with table["lock"]:
+            cached = (table["version"], compute(table["frame"]))
+        table["aggregates"][key] = cached
+    return cached[1]
+
+def read_page(path, page=0, page_size=50, query=None, columns=None, init=None):
+    """
+    One page of a table, optionally only the rows where any of `columns`
+    (default: all) contains `query` (case-insensitive). Returns (rows, total
+    matching rows). The matching row positions are kept per table version, so
+    paging through a filtered table scans it once.
+    """
+    table = _table(path, init)
+    _refresh(table)
+    with table["lock"]:
+        frame, version = table["frame"], table["version"]
+
+    if query:
+        key = (version, query.lower(), tuple(columns or ()))
+        filters = table.setdefault("filters", {})
+        positions = filters.get(key)
+        if positions is None:
+            mask = np.zeros(len(frame), dtype=bool)
+            for col in columns or frame.columns:
+                mask |= frame[col].astype(str).str.lower().str.contains(query.lower(), regex=False).to_numpy()
+            positions = np.flatnonzero(mask)
+            if len(filters) >= 16: filters.clear()
+            filters[key] = positions
+        total = len(positions)
+        rows = frame.iloc[positions[page * page_size:(page + 1) * page_size]]
+    else:
+        total = len(frame)
+        rows = frame.iloc[page * page_size:(page + 1) * page_size]
+    return rows, total
+
+def update_table(path, change, init=None):
+    """
+    Applies `change(df) -> new df` (or None for no change) in memory and queues
+    it for the next flush. `change` must not modify its argument in place.
+    Returns True if the table changed.
+    """
+    table = _table(path, init)
+    _refresh(table)
+    with table["lock"]:
+        new_frame = change(table["frame"])
+        if new_frame is None: return False
+        table["frame"] = new_frame
+        table["version"] = next(_versions)
+        table["pending"].append(change)
+    _start_flusher()
+    return True
+
+def flush(path=None):
+    """Writes pending changes (of one table, or all) to disk now."""
+    tables = list(_tables.values()) if path is None else [_table(path)]
+    for table in tables:
+        with table["lock"]:
+            if not table["pending"]: continue
+            table_path = table["path"]
+            with _file_lock(table_path):
+                frame = table["frame"]
+                if _stamp(table_path) != table["stamp"]:
+                    # Someone else wrote the file: replay our changes on top of theirs
+                    frame = _read_csv(table_path)
+                    for change in table["pending"]:
+                        changed = change(frame)
+                        if changed is not None: frame = changed
+                    table["frame"] = frame
+                    table["version"] = next(_versions)
+                _write_csv(table_path, frame)
+                table["stamp"] = _stamp(table_path)
+            table["pending"] = []
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ Data flush failed (will retry): {e}")
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None: return
+    with _tables_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="datastore-flush", daemon=True)
+            _flusher.start()
+
+atexit.register(flush)
@@ -1,58 +1,122 @@
 import pandas as pd
 import os
+import threading
+from modules import datastore, search_index, telemetry
 
 DOCTORS_FILE = "doctors.csv"
 
+# Search index over (name, specialty), tied to one version of the doctors table
+_doctor_index = {"version": None, "frame": None, "index": None}
+_doctor_index_lock = threading.Lock()
+
+def _default_doctors():
+    data = {
+        "username": ["Dr. Alex", "Dr. Smith", "Dr. House", "Dr. Joy", "Dr. Strange"],
+        "specialty": ["Dermatology", "General Medicine", "Neurology", "Psychiatry", "Surgery"],
+        "status": ["Available", "Available", "Busy", "Available", "Available"]
+    }
+    return pd.DataFrame(data)
+
 def init_doctors_db():
     """Creates a dummy doctor database if missing."""
-    if not os.path.exists(DOCTORS_FILE):
-        data = {
-            "username": ["Dr. Alex", "Dr. Smith", "Dr. House", "Dr. Joy", "Dr. Strange"],
-            "specialty": ["Dermatology", "General Medicine", "Neurology", "Psychiatry", "Surgery"],
-            "status": ["Available", "Available", "Busy", "Available", "Available"]
-        }
-        df = pd.DataFrame(data)
-        df.to_csv(DOCTORS_FILE, index=False)
+    datastore.read_table(DOCTORS_FILE, init=_default_doctors)
+
+def _search_entry():
+    """Index for the current doctors table; fully rebuilt only when edits were not applied incrementally."""
+    global _doctor_index
+    version = datastore.table_version(DOCTORS_FILE, init=_default_doctors)
+    entry = _doctor_index
+    if entry["version"] != version:
+        with _doctor_index_lock:
+            entry = _doctor_index
+            if entry["version"] != version:
+                df, version = datastore.snapshot(DOCTORS_FILE, init=_default_doctors)
+                index = search_index.build_index(zip(df['username'], df['specialty']))
+                entry = {"version": version, "frame": df, "index": index}
+                _doctor_index = entry
+    return entry
 
+def _index_change(old_frame, new_frame, new_row=None):
+    """
+    Carries the index over to the version just written by our own change
+    (old_frame -> new_frame), adding `new_row`, instead of rebuilding it.
+    Skipped if anything else changed the table in between.
+    """
+    global _doctor_index
+    with _doctor_index_lock:
+        entry = _doctor_index
+        if entry["frame"] is not old_frame: return
+        frame, version = datastore.snapshot(DOCTORS_FILE)
+        if frame is not new_frame: return
+        index = entry["index"]
+        if new_row is not None: search_index.add_document(index, (new_row['username'], new_row['specialty']))
+        _doctor_index = {"version": version, "frame": frame, "index": index}
+
+@telemetry.timed("doctor_manager.get_all_doctors")
 def get_all_doctors(search_query=None):
     """
-    Returns all available doctors.
-    If search_query is provided, filters by Name or Specialty.
+    Returns all available doctors (shared in-memory copy, do not modify).
+    If search_query is provided, filters by Name or Specialty: prefix, typo-tolerant
+    and substring matches, best match first.
     """
-    if not os.path.exists(DOCTORS_FILE):
-        init_doctors_db()
-    
-    df = pd.read_csv(DOCTORS_FILE)
+    df = datastore.read_table(DOCTORS_FILE, init=_default_doctors)
     
     # 1. Filter for Availability first (Optional: remove this line if you want to show Busy docs too)
-    # available = df[df['status'] == "Available"].copy() 
-    available = df.copy() # Let's show everyone, but mark them as Busy/Available visually
+    # available = df[df['status'] == "Available"]
+    available = df # Let's show everyone, but mark them as Busy/Available visually
     
     # 2. Apply Search Filter (if user typed something)
     if search_query:
-        query = search_query.lower()
-        # Check if query matches Name OR Specialty
-        mask = (
-            available['username'].str.lower().str.contains(query) | 
-            available['specialty'].str.lower().str.contains(query)
-        )
-        available = available[mask]
+        entry = _search_entry()
+        available = entry["frame"]
+        positions = search_index.search(entry["index"], search_query, size=len(available))
+        available = available.iloc[positions]
         
     return available
 
+def _doctor_stats(df):
+    return {"doctors": len(df), "available": int((df['status'] == "Available").sum())}
+
+def doctor_stats():
+    """Doctor counts (recomputed only after the doctors table changes)."""
+    return datastore.aggregates(DOCTORS_FILE, _doctor_stats, init=_default_doctors)
+
+@telemetry.timed("doctor_manager.get_doctors_page")
+def get_doctors_page(page=0, page_size=50, search_query=None):
+    """One page of get_all_doctors(search_query). Returns (rows, total matching)."""
+    if search_query:
+        matches = get_all_doctors(search_query)
+        return matches.iloc[page * page_size:(page + 1) * page_size], len(matches)
+    return datastore.read_page(DOCTORS_FILE, page, page_size, init=_default_doctors)
+
+@telemetry.timed("doctor_manager.update_doctor_status")
 def update_doctor_status(username, status):
     if not os.path.exists(DOCTORS_FILE): return False
-    df = pd.read_csv(DOCTORS_FILE)
-    if username in df['username'].values:
-        df.loc[df['username'] == username, 'status'] = status
-        df.to_csv(DOCTORS_FILE, index=False)
-        return True
-    return False
 
+    frames = [] # (before, after) of each call; the first one is the in-memory update
+
+    def set_status(df):
+        if username not in df['username'].values: return None
+        new_df = df.copy()
+        new_df.loc[new_df['username'] == username, 'status'] = status
+        frames.append((df, new_df))
+        return new_df
+
+    if not datastore.update_table(DOCTORS_FILE, set_status): return False
+    _index_change(*frames[0]) # Names and specialties unchanged: same index
+    return True
+
+@telemetry.timed("doctor_manager.register_doctor_profile")
 def register_doctor_profile(username, specialty):
-    if not os.path.exists(DOCTORS_FILE): init_doctors_db()
-    df = pd.read_csv(DOCTORS_FILE)
-    if username not in df['username'].values:
-        new_row = pd.DataFrame([{"username": username, "specialty": specialty, "status": "Available"}])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(DOCTORS_FILE, index=False)
\ No newline at end of file
+    new_row = pd.DataFrame([{"username": username, "specialty": specialty, "status": "Available"}])
+
+    frames = [] # (before, after) of each call; the first one is the in-memory update
+
+    def add_doctor(df):
+        if username in df['username'].values: return None
+        new_df = pd.concat([df, new_row], ignore_index=True)
+        frames.append((df, new_df))
+        return new_df
+
+    if datastore.update_table(DOCTORS_FILE, add_doctor, init=_default_doctors):
+        _index_change(*frames[0], new_row.iloc[0])
\ No newline at end of file
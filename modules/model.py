@@ -1,62 +1,342 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
+import hashlib
+import os
+import re
+import threading
+import weakref
+from modules import telemetry
+
+try:
+    import pyarrow  # Enables the memory-mapped copy of the cleaned dataset
+except ImportError:
+    pyarrow = None
+
+# Cleaned copies of drugs.csv, one Arrow file per source file hash. The file is
+# memory-mapped read-only: every process on a host reads the same pages (numbers
+# and strings, stored as offset + data buffers) instead of holding its own copy
+CACHE_DIR = "cache"
+# Low-cardinality text columns, stored dictionary-encoded (pandas category)
+CATEGORY_COLS = ['medical_condition', 'drug_name']
+
+# Key under which load_data stamps the source file identity into df.attrs
+INDEX_KEY = "recommendation_index"
+MATCH_CACHE_LIMIT = 1024 # Max remembered query -> condition lookups
+
+_rec_index = None
+_rec_index_lock = threading.Lock()
 
 # -----------------------------------------------------------------------------
 # 1. DATA LOADING
 # -----------------------------------------------------------------------------
-@st.cache_data
+def _source_stamp(filepath):
+    """Cheap identity of the source file. Changes whenever the file is edited."""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
 def load_data(filepath="drugs.csv"):
+    """
+    Loads the drugs dataset (cached per file version) and makes sure the
+    recommendation index for it is built.
+    The returned frame is shared by every caller and must be treated as
+    read-only: derive new frames from it (filter, sort, assign) instead.
+    """
+    global _rec_index
+    df = _load_data(filepath, _source_stamp(filepath))
+
+    if df.attrs.get(INDEX_KEY) is not None and _index_frame(_rec_index) is not df:
+        with _rec_index_lock:
+            if _index_frame(_rec_index) is not df:
+                _rec_index = build_recommendation_index(df)
+    return df
+
+# cache_resource hands every rerun the same (read-only) frame instead of a fresh
+# copy; one entry, so an edited file or another path replaces the old frame
+@st.cache_resource(max_entries=1)
+def _load_data(filepath, stamp):
     try:
-        df = pd.read_csv(filepath)
-        df.columns = [c.lower().strip() for c in df.columns]
-        
-        # Clean numeric
-        df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
-        df['no_of_reviews'] = pd.to_numeric(df['no_of_reviews'], errors='coerce').fillna(0)
-        
-        # Clean text
-        text_cols = ['medical_condition', 'drug_name', 'side_effects']
-        for col in text_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).fillna("")
-                
+        df = _read_cached(filepath)
+        df.attrs[INDEX_KEY] = stamp
         return df
     except FileNotFoundError:
         st.error(f"File not found: {filepath}")
         return pd.DataFrame()
 
+def _clean_data(df):
+    df.columns = [c.lower().strip() for c in df.columns]
+
+    # Clean numeric
+    df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
+    df['no_of_reviews'] = pd.to_numeric(df['no_of_reviews'], errors='coerce').fillna(0)
+
+    # Clean text
+    text_cols = ['medical_condition', 'drug_name', 'side_effects']
+    for col in text_cols:
+        if col in df.columns:
+            df[col] = df[col].astype(str).fillna("")
+
+    # Repeated names: one copy of each string + small integer codes
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+def _file_digest(filepath):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _map_catalogue(path):
+    """DataFrame over a memory-mapped Arrow file; columns are views of the mapping, not copies."""
+    table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+    # split_blocks: one block per column, so numeric columns are not consolidated (copied)
+    return table.to_pandas(split_blocks=True)
+
+def _read_cached(filepath):
+    """
+    Returns the cleaned dataset, mapping the Arrow copy keyed by the CSV's
+    hash when present and parsing + caching the CSV otherwise.
+    """
+    if pyarrow is None:
+        return _clean_data(pd.read_csv(filepath))
+
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    cache_path = os.path.join(CACHE_DIR, f"{stem}-{_file_digest(filepath)}.arrow")
+
+    if os.path.exists(cache_path):
+        try:
+            return _map_catalogue(cache_path)
+        except Exception:
+            pass # Corrupt/partial cache file: rebuild it below
+
+    df = _clean_data(pd.read_csv(filepath))
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a private temp file first so concurrent replicas never read half a file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_feather(tmp_path, compression="uncompressed") # Uncompressed: mappable as is
+        os.replace(tmp_path, cache_path)
+
+        # Drop copies of older versions of the same source file (and the old Parquet copies)
+        stale = re.compile(re.escape(stem) + r"-[0-9a-f]{32}\.(arrow|parquet)")
+        for name in os.listdir(CACHE_DIR):
+            old_path = os.path.join(CACHE_DIR, name)
+            if stale.fullmatch(name) and old_path != cache_path:
+                os.remove(old_path)
+        # Even the process that wrote it uses the shared mapping from now on
+        return _map_catalogue(cache_path)
+    except OSError as e:
+        print(f"⚠️ Could not write dataset cache: {e}")
+    return df
+
 # -----------------------------------------------------------------------------
 # 2. STATISTICAL RANKING LOGIC
 # -----------------------------------------------------------------------------
+def _weighted_rating(v, R, m, C):
+    """Vectorized IMDB score: v = reviews, R = rating, m = median reviews, C = mean rating."""
+    total = v + m
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = (v / total * R) + (m / total * C)
+    return score.where(total != 0, 0.0)
+
+def _rank_subset(subset):
+    """Quality-filters one condition's rows and sorts them by trust score."""
+    # Quality Filter (Remove Bad Drugs)
+    subset = subset[subset['rating'] >= 6.0].copy()
+
+    if subset.empty: return pd.DataFrame()
+
+    # Weighted Ranking Formula (IMDB Score)
+    m = subset['no_of_reviews'].quantile(0.50)
+    C = subset['rating'].mean()
+
+    subset['trust_score'] = _weighted_rating(subset['no_of_reviews'], subset['rating'], m, C)
+
+    return subset.sort_values('trust_score', ascending=False)
+
+def _score_groups(frame, key):
+    """
+    Same as _rank_subset, but for every group of `frame` (grouped by the `key`
+    column) in one pass. Returns {group: ranked rows}.
+    """
+    frame = frame[frame['rating'] >= 6.0].copy()
+    if frame.empty: return {}
+
+    # Per-group constants use the same Series reductions as _rank_subset, so the
+    # scores are bit-identical to ranking each group on its own
+    groups = frame.groupby(key, sort=False, observed=True)
+    m = groups['no_of_reviews'].transform(lambda s: s.quantile(0.50))
+    C = groups['rating'].transform(lambda s: s.mean())
+
+    frame['trust_score'] = _weighted_rating(frame['no_of_reviews'], frame['rating'], m, C)
+
+    return {
+        name: group.sort_values('trust_score', ascending=False)
+        for name, group in frame.groupby(key, sort=False, observed=True)
+    }
+
+@telemetry.timed("model.get_recommendations")
 def get_recommendations(condition, df, top_k=5):
     """
     Input: Exact Condition Name (from SVM)
     Output: Top Rated Drugs
     """
     if df.empty: return pd.DataFrame()
-    
-    # 1. Filter by Condition (Exact Match or Partial)
-    # We use string contains to be safe (e.g. "Acne" matches "Acne (Severe)")
-    subset = df[df['medical_condition'].str.contains(condition, case=False, na=False)].copy()
-    
-    if subset.empty: return pd.DataFrame()
 
-    # 2. Quality Filter (Remove Bad Drugs)
-    subset = subset[subset['rating'] >= 6.0]
-    
-    if subset.empty: return pd.DataFrame()
+    index = _index_for(df)
+    if index is not None:
+        ranked = _lookup(index, condition, df, top_k)
+    else:
+        # Filter by Condition (Exact Match or Partial)
+        # We use string contains to be safe (e.g. "Acne" matches "Acne (Severe)")
+        literal = (df['medical_condition'].astype(str).str.lower() == condition.lower()).any()
+        subset = df[df['medical_condition'].str.contains(condition, case=False, na=False, regex=not literal)]
+        ranked = _rank_subset(subset)
 
-    # 3. Weighted Ranking Formula (IMDB Score)
-    m = subset['no_of_reviews'].quantile(0.50)
-    C = subset['rating'].mean()
-    
-    def weighted_rating(x):
-        v = x['no_of_reviews']
-        R = x['rating']
-        if (v+m) == 0: return 0
-        return (v/(v+m) * R) + (m/(v+m) * C)
-    
-    subset['trust_score'] = subset.apply(weighted_rating, axis=1)
-    
-    return subset.sort_values('trust_score', ascending=False).head(top_k)
\ No newline at end of file
+    if ranked.empty: return pd.DataFrame()
+
+    return ranked.head(top_k).copy()
+
+@telemetry.timed("model.get_recommendations_batch")
+def get_recommendations_batch(conditions, df, top_k=5):
+    """
+    Input: Many Condition Names (e.g. every condition, for evaluation or pre-warming)
+    Output: One frame with the queried 'condition' and its 'rank' (1 = best) in front.
+    The rows of each condition equal get_recommendations(condition, df, top_k).
+    """
+    if df.empty: return pd.DataFrame()
+
+    index = _index_for(df)
+    if index is None:
+        index = _match_catalog(df)
+
+    # Gather the matching rows of every query, labelled with the query itself
+    rows, keys = [], []
+    for condition in dict.fromkeys(conditions):
+        matches = _matching_conditions(index, condition)
+        if not matches: continue
+        pos = np.sort(np.concatenate([index["positions"][c] for c in matches]))
+        rows.append(pos)
+        keys.append(np.full(len(pos), condition, dtype=object))
+
+    if not rows: return pd.DataFrame()
+
+    frame = df.iloc[np.concatenate(rows)].assign(condition=np.concatenate(keys))
+    ranked = _score_groups(frame, 'condition')
+    if not ranked: return pd.DataFrame()
+
+    result = pd.concat([group.head(top_k) for group in ranked.values()])
+    if result.empty: return pd.DataFrame()
+
+    result['rank'] = result.groupby('condition', sort=False).cumcount() + 1
+    return result[['condition', 'rank'] + list(df.columns) + ['trust_score']]
+
+# -----------------------------------------------------------------------------
+# 3. RECOMMENDATION INDEX
+# -----------------------------------------------------------------------------
+def build_recommendation_index(df):
+    """
+    Precomputes the full trust-score ranking of every condition in `df`,
+    so get_recommendations only has to slice the top_k rows. Rankings are
+    row positions + scores: no rows of the (shared) catalogue are copied.
+    """
+    index = _match_catalog(df)
+    ranked = _score_groups(_score_columns(df), 'medical_condition')
+    index.update({
+        "stamp": df.attrs.get(INDEX_KEY),
+        "frame": weakref.ref(df), # The row positions below belong to this frame only
+        "stats": _catalogue_stats(df),
+        # Condition name -> (positions, trust scores) of its drugs rated >= 6, best first
+        "ranked": {name: _positions(group) for name, group in ranked.items()},
+        # Tuple of condition names -> ranking of their combined rows
+        "merged": {},
+    })
+    return index
+
+def _score_columns(df):
+    """The columns the trust score needs, indexed by row position."""
+    return pd.DataFrame({c: df[c].array for c in ('medical_condition', 'rating', 'no_of_reviews')})
+
+def _positions(ranked):
+    """(row positions, trust scores) of a ranking made from _score_columns."""
+    if ranked.empty: return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return ranked.index.to_numpy(), ranked['trust_score'].to_numpy()
+
+def _match_catalog(df):
+    """Distinct condition names with their row positions, for query matching."""
+    positions = df.groupby('medical_condition', sort=False, observed=True).indices
+    return {
+        "conditions": list(positions),
+        "names": {str(c).lower() for c in positions}, # Exact names are matched literally
+        "positions": positions,
+        # Query text -> tuple of matching condition names (partial/case-insensitive)
+        "matches": {},
+    }
+
+def _index_frame(index):
+    return None if index is None else index["frame"]()
+
+def _index_for(df):
+    """Returns the index for the frame returned by load_data, or None for any other frame."""
+    index = _rec_index
+    # Derived frames (filtered, shuffled, sorted, assigned) keep df.attrs and maybe
+    # the length, but not the row positions: only the loaded frame itself qualifies
+    if _index_frame(index) is not df: return None
+    return index
+
+def _catalogue_stats(df):
+    return {
+        "drugs": len(df),
+        "reviews": float(df['no_of_reviews'].sum()) if 'no_of_reviews' in df.columns else 0.0,
+    }
+
+def catalogue_stats(df):
+    """Row and review counts of the catalogue (precomputed at load time for load_data frames)."""
+    index = _index_for(df)
+    return index["stats"] if index is not None else _catalogue_stats(df)
+
+def _matching_conditions(index, condition):
+    """
+    Resolves a query exactly like str.contains(condition, case=False) would;
+    an exact condition name is taken literally ("GERD (Heartburn)" is no regex group).
+    """
+    matches = index["matches"].get(condition)
+    if matches is None:
+        literal = condition.lower() in index["names"]
+        pattern = re.compile(re.escape(condition) if literal else condition, flags=re.IGNORECASE)
+        matches = tuple(c for c in index["conditions"] if pattern.search(c))
+        if len(index["matches"]) >= MATCH_CACHE_LIMIT: index["matches"].clear()
+        index["matches"][condition] = matches
+    return matches
+
+def _lookup(index, condition, df, top_k=None):
+    """Returns the ranking for a query from the index (its first top_k rows)."""
+    matches = _matching_conditions(index, condition)
+
+    if not matches: return pd.DataFrame()
+    if len(matches) == 1:
+        ranked = index["ranked"].get(matches[0])
+    else:
+        # Partial query hitting several conditions: score their union as one subset
+        ranked = index["merged"].get(matches)
+        if ranked is None:
+            rows = np.sort(np.concatenate([index["positions"][c] for c in matches]))
+            ranked = _positions(_rank_subset(_score_columns(df).iloc[rows]))
+            if len(index["merged"]) >= MATCH_CACHE_LIMIT: index["merged"].clear()
+            index["merged"][matches] = ranked
+    if ranked is None: return pd.DataFrame()
+
+    positions, scores = ranked
+    if top_k is not None: positions, scores = positions[:top_k], scores[:top_k]
+    if not len(positions): return pd.DataFrame()
+    # Only the shown rows are taken out of the shared catalogue
+    frame = df.iloc[positions]
+    frame['trust_score'] = scores
+    return frame
@@ -1,62 +1,201 @@
 import joblib
+import numpy as np
+import sklearn
 import os
 import streamlit as st
 import re
+import threading
+from collections import OrderedDict
+from modules import telemetry, condition_matcher
 
 # Paths
 MODEL_DIR = "models"
+# Fused vectorizer + SVM written by train.py; its numpy arrays are memory-mapped
+# read-only, so all processes on a host share one copy via the OS page cache
+PIPELINE_PATH = os.path.join(MODEL_DIR, "condition_pipeline.joblib")
+PIPELINE_VERSION = 1
+# Legacy separate artifacts, used when no fused pipeline exists
 SVM_PATH = os.path.join(MODEL_DIR, "svm_condition.joblib")
 VEC_PATH = os.path.join(MODEL_DIR, "tfidf_condition.joblib")
 
+# Max remembered (normalized query -> condition) pairs; 0 disables the cache
+QUERY_CACHE_SIZE = int(os.environ.get("SAMHATI_QUERY_CACHE_SIZE", 4096))
+
+# --- SMART GREETING GUARD ---
+# We use regex patterns to catch variations like "hiii", "hlo", "hy"
+GREETING_PATTERNS = [
+    r"\bh+[ei]+y*\b",              # Matches: hi, hii, hey, heyy, hy, hie
+    r"\bh+e*l+o+\b",               # Matches: hello, helo, hlo, helllo
+    r"\bgreetings\b",              # Matches: greetings
+    r"\bsup\b",                    # Matches: sup
+    r"\b(good\s+)?(morning|afternoon|evening|night)\b", # Matches: good morning, morning
+    r"\bhow\s+are\s+you\b",        # Matches: how are you
+    r"\bwho\s+are\s+you\b"         # Matches: who are you
+]
+# All patterns in one compiled alternation: one scan per text instead of seven
+_GREETING_RE = re.compile("|".join(f"(?:{p})" for p in GREETING_PATTERNS))
+
 _svm_model = None
 _vectorizer = None
+_load_lock = threading.Lock()
+_warmed_up = False
+
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def save_pipeline(vectorizer, svm_model, path=PIPELINE_PATH):
+    """Writes the fused, versioned artifact (uncompressed, so it can be memory-mapped)."""
+    joblib.dump({
+        "version": PIPELINE_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "vectorizer": vectorizer,
+        "svm": svm_model,
+    }, path)
+
+def _read_models():
+    if os.path.exists(PIPELINE_PATH):
+        pipeline = joblib.load(PIPELINE_PATH, mmap_mode='r')
+        if pipeline.get("version") == PIPELINE_VERSION:
+            return pipeline["svm"], pipeline["vectorizer"]
+    if not os.path.exists(SVM_PATH): return None, None
+    return joblib.load(SVM_PATH), joblib.load(VEC_PATH)
 
 def load_models():
-    global _svm_model, _vectorizer
+    """Loads the models on first use (thread-safe). Returns False if unavailable."""
+    global _svm_model, _vectorizer, _warmed_up
     if _svm_model is None:
-        try:
-            if not os.path.exists(SVM_PATH): return False
-            _svm_model = joblib.load(SVM_PATH)
-            _vectorizer = joblib.load(VEC_PATH)
-            return True
-        except Exception:
-            return False
+        with _load_lock:
+            if _svm_model is None:
+                try:
+                    svm_model, vectorizer = _read_models()
+                    if svm_model is None: return False
+                    _vectorizer = vectorizer
+                    _svm_model = svm_model
+                    _warmed_up = False
+                    clear_query_cache()
+                except Exception:
+                    return False
     return True
 
-def predict_condition(user_text):
+def warm_up():
     """
-    1. Smartly filters out greetings (slang, typos, repeats).
-    2. Predicts medical condition using SVM.
-    """
-    text = user_text.lower().strip()
-    
-    # --- 1. SMART GREETING GUARD ---
-    # We use regex patterns to catch variations like "hiii", "hlo", "hy"
-    greeting_patterns = [
-        r"\bh+[ei]+y*\b",              # Matches: hi, hii, hey, heyy, hy, hie
-        r"\bh+e*l+o+\b",               # Matches: hello, helo, hlo, helllo
-        r"\bgreetings\b",              # Matches: greetings
-        r"\bsup\b",                    # Matches: sup
-        r"\b(good\s+)?(morning|afternoon|evening|night)\b", # Matches: good morning, morning
-        r"\bhow\s+are\s+you\b",        # Matches: how are you
-        r"\bwho\s+are\s+you\b"         # Matches: who are you
-    ]
-    
-    # Check if any pattern matches
-    for pattern in greeting_patterns:
-        if re.search(pattern, text):
-            return "General"
-
-    # --- 2. ML PREDICTION ---
-    if not load_models():
-        return "General"
-    
+    Explicit warm-up hook: loads the models and runs one prediction, so the
+    mapped pages and sklearn's code paths are ready before the first user query.
+    """
+    global _warmed_up
+    if _warmed_up: return True
+    if not load_models(): return False
     try:
-        # Vectorize text
-        input_vec = _vectorizer.transform([user_text])
-        
-        # Predict
-        prediction = _svm_model.predict(input_vec)[0]
-        return prediction
+        _svm_model.predict(_vectorizer.transform(["warm up headache"]))
     except Exception:
-        return "General"
\ No newline at end of file
+        return False
+    _warmed_up = True
+    return True
+
+def vectorize(texts):
+    """TF-IDF rows (L2-normalized) for `texts` from the loaded vectorizer, or None."""
+    if not load_models(): return None
+    try:
+        return _vectorizer.transform(texts)
+    except Exception:
+        return None
+
+def vocabulary():
+    """Term -> column of the loaded TF-IDF vectorizer, or None (no models / hashing vectorizer)."""
+    if not load_models(): return None
+    return getattr(_vectorizer, "vocabulary_", None)
+
+def clear_query_cache():
+    with _query_cache_lock:
+        _query_cache.clear()
+
+def _normalize(user_text):
+    # Lowercase + collapsed whitespace: same greeting matches and TF-IDF tokens as the raw text
+    return " ".join(user_text.lower().split())
+
+def _cache_get(key):
+    with _query_cache_lock:
+        if key not in _query_cache: return None
+        _query_cache.move_to_end(key)
+        return _query_cache[key]
+
+def _cache_put(key, condition):
+    with _query_cache_lock:
+        _query_cache[key] = condition
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > max(QUERY_CACHE_SIZE, 0):
+            _query_cache.popitem(last=False)
+
+@telemetry.timed("predictor.predict_conditions")
+def predict_conditions(texts):
+    """
+    Batch version of predict_condition: one keyword pass and one greeting regex
+    scan per text, and a single vectorize + predict call for every text left
+    that is not already cached.
+    Returns a list of conditions in input order.
+    """
+    results = [None] * len(texts)
+    pending = {} # normalized text -> positions still needing the SVM
+
+    for i, user_text in enumerate(texts):
+        key = _normalize(user_text)
+
+        # --- 1. CONDITION KEYWORDS (names / synonyms: no SVM needed) ---
+        named = condition_matcher.match(key)
+        if named is not None:
+            results[i] = named
+            continue
+
+        # --- 2. SMART GREETING GUARD ---
+        if _GREETING_RE.search(key):
+            results[i] = "General"
+            continue
+
+        cached = _cache_get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+
+    if not pending: return results
+
+    # --- 3. ML PREDICTION ---
+    predictions = None
+    if load_models():
+        try:
+            # Vectorize + predict all remaining texts at once
+            input_vec = _vectorizer.transform(list(pending))
+            predictions = _svm_model.predict(input_vec)
+        except Exception:
+            predictions = None
+
+    for j, (key, positions) in enumerate(pending.items()):
+        condition = "General" if predictions is None else predictions[j]
+        if predictions is not None: _cache_put(key, condition)
+        for i in positions:
+            results[i] = condition
+    return results
+
+@telemetry.timed("predictor.predict_condition")
+def predict_condition(user_text):
+    """
+    1. Takes a condition the text names directly (keyword / synonym match).
+    2. Smartly filters out greetings (slang, typos, repeats).
+    3. Predicts medical condition using SVM.
+    """
+    return predict_conditions([user_text])[0]
+
+def rank_conditions(texts, k=3):
+    """
+    The k most likely conditions per text, best first, as an array of shape
+    (len(texts), k). No greeting guard or cache (for evaluation). None without models.
+    """
+    if not load_models(): return None
+    scores = _svm_model.decision_function(_vectorizer.transform(texts))
+    classes = _svm_model.classes_
+    if scores.ndim == 1: # Two classes: one score, positive = classes[1]
+        scores = np.column_stack([-scores, scores])
+    k = min(k, len(classes))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return classes[np.take_along_axis(top, order, axis=1)]
@@ -0,0 +1,120 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from modules import predictor
+
+# -----------------------------------------------------------------------------
+# Cache of AI assistant replies. Entries are grouped by (predicted condition,
+# recommended drug ids, prior chat turns); inside a group a reply is reused for
+# the same normalized question or a TF-IDF near-duplicate of it. TF-IDF drops
+# words outside its vocabulary (and stop words such as "not"), so a near
+# duplicate must also have exactly the same out-of-vocabulary words:
+# "dose for my son" never gets the answer cached for "dose for my daughter".
+# -----------------------------------------------------------------------------
+ENABLED = os.environ.get("SAMHATI_RESPONSE_CACHE", "1") != "0"
+CACHE_TTL = float(os.environ.get("SAMHATI_RESPONSE_CACHE_TTL", 3600)) # Seconds a reply stays valid
+CACHE_SIZE = int(os.environ.get("SAMHATI_RESPONSE_CACHE_SIZE", 1024)) # Max replies kept (LRU)
+SIMILARITY_THRESHOLD = 0.9 # Min cosine similarity of TF-IDF vectors for a near-duplicate hit
+
+_entries = OrderedDict() # (bucket, normalized text) -> entry
+_buckets = {}            # bucket -> set of entry keys
+_stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+def _normalize(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def make_bucket(condition, recommended_drugs_df, context=()):
+    """
+    Cache group: predicted condition + ids of the top-3 recommended drugs +
+    the prior chat turns sent along with the question ({"role", "content"} dicts).
+    """
+    drug_ids = tuple(recommended_drugs_df.head(3).index.tolist()) if not recommended_drugs_df.empty else ()
+    turns = tuple((m["role"], _normalize(str(m["content"]))) for m in context)
+    return (str(condition), drug_ids, turns)
+
+def _out_of_vocabulary(text):
+    """Words of a normalized text that the TF-IDF vectors can't see (all of them without a vocabulary)."""
+    words = frozenset(text.split())
+    vocabulary = predictor.vocabulary()
+    if vocabulary is None: return words
+    return frozenset(w for w in words if w not in vocabulary)
+
+def _drop(key):
+    entry = _entries.pop(key)
+    keys = _buckets.get(entry["bucket"])
+    if keys is not None:
+        keys.discard(key)
+        if not keys: del _buckets[entry["bucket"]]
+
+def get(bucket, user_text):
+    """Returns a cached reply for this bucket and question, or None."""
+    text = _normalize(user_text)
+    key = (bucket, text)
+    now = time.monotonic()
+    oov = _out_of_vocabulary(text)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["expires"] > now:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry["reply"]
+        if entry is not None: _drop(key)
+        # Near-duplicate candidates: same bucket, same out-of-vocabulary words
+        candidates = [k for k in _buckets.get(bucket, ())
+                      if _entries[k]["vector"] is not None and _entries[k]["oov"] == oov]
+
+    # Near-duplicate search: compare TF-IDF vectors of the candidates
+    if candidates:
+        vector = predictor.vectorize([text])
+        if vector is not None and vector.nnz:
+            with _lock:
+                best_key, best_score = None, SIMILARITY_THRESHOLD
+                for k in candidates:
+                    entry = _entries.get(k)
+                    if entry is None or entry["expires"] <= now: continue
+                    score = vector.multiply(entry["vector"]).sum() # Rows are L2-normalized: dot = cosine
+                    if score >= best_score:
+                        best_key, best_score = k, score
+                if best_key is not None:
+                    _entries.move_to_end(best_key)
+                    _stats["near_hits"] += 1
+                    return _entries[best_key]["reply"]
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def put(bucket, user_text, reply):
+    text = _normalize(user_text)
+    key = (bucket, text)
+    vector = predictor.vectorize([text])
+    entry = {
+        "bucket": bucket,
+        "reply": reply,
+        "vector": vector if vector is not None and vector.nnz else None,
+        "oov": _out_of_vocabulary(text),
+        "expires": time.monotonic() + CACHE_TTL,
+    }
+    with _lock:
+        if key in _entries: _drop(key)
+        _entries[key] = entry
+        _buckets.setdefault(bucket, set()).add(key)
+        while len(_entries) > max(CACHE_SIZE, 0):
+            _drop(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+def stats():
+    """Hit/miss counters and current size."""
+    with _lock:
+        total = _stats["hits"] + _stats["near_hits"] + _stats["misses"]
+        hit_rate = (_stats["hits"] + _stats["near_hits"]) / total if total else 0.0
+        return {**_stats, "size": len(_entries), "hit_rate": hit_rate}
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _buckets.clear()
@@ -0,0 +1,196 @@
+import bisect
+import math
+import re
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Small in-memory text search index (used for the doctor directory).
+# Documents are tuples of text fields, identified by their position (0, 1, ...).
+# A query matches a document when every query word matches one of its words
+# exactly, as a prefix or fuzzily (shared trigrams), or when the whole query
+# appears inside one of its fields. Results are ranked by score.
+#
+# Postings are stored flat: the positions of key i are positions[starts[i]:starts[i + 1]].
+# -----------------------------------------------------------------------------
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SEPARATOR = "\n" # Between fields in the substring-search blob; never part of a query
+
+FUZZY_THRESHOLD = 0.6 # Min Dice similarity of trigram sets for a fuzzy word match
+MIN_FUZZY_LENGTH = 3  # Shorter query words only match exactly / as prefix
+
+EXACT_SCORE = 2.0     # Word equals a document word
+PREFIX_SCORE = 1.5    # Word is the start of a document word
+PHRASE_SCORE = 1.0    # Whole query is inside a field (+ EXACT_SCORE if it is the whole field)
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+def _trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _flatten(keys, postings):
+    """(starts, positions) for postings[key] of each key, in order."""
+    blocks = [np.array(sorted(postings[key]), dtype=np.int64) for key in keys]
+    starts = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blocks], out=starts[1:])
+    return starts, np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int64)
+
+def _append_posting(starts, positions, i, position, new_key):
+    """Copies of (starts, positions) with `position` added last to key i (inserted first if new_key)."""
+    if new_key: starts = np.insert(starts, i + 1, starts[i])
+    else: starts = starts.copy()
+    positions = np.insert(positions, starts[i + 1], position)
+    starts[i + 1:] += 1
+    return starts, positions
+
+def _gather(starts, positions, keys):
+    """All positions of the given keys, as one array."""
+    lengths = starts[keys + 1] - starts[keys]
+    total = int(lengths.sum())
+    if not total: return positions[:0]
+    # Index of every wanted slot: each key's start, then +1, +2, ... within its block
+    shift = np.repeat(starts[keys] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return positions[np.arange(total) + shift]
+
+def build_index(documents):
+    """Index over an iterable of field tuples; position = order of iteration."""
+    tokens, fields, trigrams = {}, {}, {}
+    size = 0
+    for position, doc_fields in enumerate(documents):
+        size = position + 1
+        for text in doc_fields:
+            text = str(text).lower()
+            fields.setdefault(text, set()).add(position)
+            for token in tokenize(text):
+                if token not in tokens:
+                    tokens[token] = set()
+                    for gram in _trigrams(token):
+                        trigrams.setdefault(gram, set()).add(token)
+                tokens[token].add(position)
+
+    vocab, texts = sorted(tokens), list(fields)
+    offsets = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum([len(t) + len(SEPARATOR) for t in texts[:-1]], out=offsets[1:])
+    return {
+        "size": size,
+        # Sorted words + their postings: all words sharing a prefix are one slice
+        "words": (vocab, *_flatten(vocab, tokens)),
+        "trigrams": {gram: frozenset(t) for gram, t in trigrams.items()}, # trigram -> words
+        # Distinct lowercase field texts (id = order), joined by SEPARATOR into one
+        # blob for substring search, the start offset of each, and their postings
+        "fields": ({text: i for i, text in enumerate(texts)}, SEPARATOR.join(texts), offsets,
+                   *_flatten(texts, fields)),
+    }
+
+def add_document(index, fields):
+    """
+    Appends one document in place and returns its position. Every container a
+    search may be reading is replaced rather than mutated, so concurrent
+    searches see either the old or the new state.
+    """
+    position = index["size"]
+    text_ids, blob, offsets, starts, positions = index["fields"]
+    doc_tokens = []
+    for text in dict.fromkeys(str(t).lower() for t in fields):
+        i = text_ids.get(text)
+        new_key = i is None
+        if new_key:
+            i = len(text_ids)
+            offsets = np.append(offsets, len(blob) + len(SEPARATOR) if i else 0)
+            blob = blob + SEPARATOR + text if i else text
+            text_ids = {**text_ids, text: i}
+        starts, positions = _append_posting(starts, positions, i, position, new_key)
+        doc_tokens.extend(tokenize(text))
+    index["fields"] = (text_ids, blob, offsets, starts, positions)
+
+    vocab, starts, positions = index["words"]
+    vocab = list(vocab)
+    for token in dict.fromkeys(doc_tokens):
+        i = bisect.bisect_left(vocab, token)
+        new_key = i == len(vocab) or vocab[i] != token
+        if new_key:
+            vocab.insert(i, token)
+            trigrams = dict(index["trigrams"])
+            for gram in _trigrams(token):
+                trigrams[gram] = trigrams.get(gram, frozenset()) | {token}
+            index["trigrams"] = trigrams
+        starts, positions = _append_posting(starts, positions, i, position, new_key)
+    index["words"] = (vocab, starts, positions)
+    index["size"] = position + 1
+    return position
+
+def _fuzzy_matches(index, word):
+    """{document word: Dice similarity} for words at least FUZZY_THRESHOLD alike."""
+    grams = _trigrams(word)
+    # A match shares at least `needed` trigrams, so it must contain one of the
+    # (len(grams) - needed + 1) rarest ones: only those are scanned for candidates.
+    needed = math.ceil(len(grams) * FUZZY_THRESHOLD / (2 - FUZZY_THRESHOLD))
+    trigrams = index["trigrams"]
+    ranked = sorted(grams, key=lambda g: len(trigrams.get(g, ())))
+    candidates = set()
+    for gram in ranked[:len(grams) - needed + 1]:
+        candidates.update(trigrams.get(gram, ()))
+
+    matches = {}
+    for token in candidates:
+        similarity = 2 * len(grams & _trigrams(token)) / (len(grams) + len(token))
+        if similarity >= FUZZY_THRESHOLD: matches[token] = similarity
+    return matches
+
+def _word_scores(index, word, size):
+    """Best score of `word` against each document's words (0 = no match)."""
+    vocab, starts, positions = index["words"]
+    first = bisect.bisect_left(vocab, word)
+    last = bisect.bisect_left(vocab, word + "{", first) # "{" sorts after every word character
+    exact = first < last and vocab[first] == word
+
+    def mark(begin, end, score):
+        hits = positions[starts[begin]:starts[end]]
+        scores[hits[hits < size]] = score
+
+    scores = np.zeros(size, dtype=np.float32)
+    # Weakest matches first, so stronger ones overwrite them
+    if first == last and len(word) >= MIN_FUZZY_LENGTH: # Typos only when nothing matches as typed
+        for token, similarity in sorted(_fuzzy_matches(index, word).items(), key=lambda m: m[1]):
+            i = bisect.bisect_left(vocab, token)
+            mark(i, i + 1, similarity)
+    if last - first > int(exact):
+        mark(first + int(exact), last, PREFIX_SCORE)
+    if exact:
+        mark(first, first + 1, EXACT_SCORE)
+    return scores
+
+def search(index, query, size=None):
+    """Positions of matching documents, best first (ties keep document order)."""
+    phrase = " ".join(str(query).lower().split())
+    size = index["size"] if size is None else min(size, index["size"])
+    if not phrase or not size: return np.zeros(0, dtype=np.int64)
+
+    # 1. Every query word must match some word of the document
+    total = np.zeros(size, dtype=np.float32)
+    matched = np.zeros(size, dtype=bool)
+    words = tokenize(phrase)
+    if words:
+        matched[:] = True
+        for word in words:
+            scores = _word_scores(index, word, size)
+            matched &= scores > 0
+            if not matched.any(): break
+            total += scores
+
+    # 2. Whole query inside a field (the old str.contains behaviour, literal)
+    text_ids, blob, offsets, starts, positions = index["fields"]
+    hits = [m.start() for m in re.finditer(re.escape(phrase), blob)]
+    if hits:
+        hit_fields = np.unique(np.searchsorted(offsets, hits, side="right") - 1)
+        hit_docs = _gather(starts, positions, hit_fields)
+        hit_docs = hit_docs[hit_docs < size]
+        np.add.at(total, hit_docs, PHRASE_SCORE)
+        matched[hit_docs] = True
+        if phrase in text_ids:
+            whole = _gather(starts, positions, np.array([text_ids[phrase]]))
+            np.add.at(total, whole[whole < size], EXACT_SCORE)
+
+    found = np.flatnonzero(matched)
+    return found[np.lexsort((found, -total[found]))]
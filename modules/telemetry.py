@@ -0,0 +1,151 @@
+import os
+import math
+import json
+import time
+import threading
+import functools
+import contextlib
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# Lightweight timing spans for the hot paths.
+# Every finished span goes into a ring buffer (recent raw spans, exportable as
+# JSON lines) and into a per-name histogram (all-time p50/p95 in constant memory).
+# Events (no duration) go into the ring buffer and a per-name counter only.
+# With SAMHATI_TIMING=0 the instrumentation is a single flag check per call.
+# -----------------------------------------------------------------------------
+ENABLED = os.environ.get("SAMHATI_TIMING", "1") != "0"
+RING_SIZE = int(os.environ.get("SAMHATI_TIMING_RING", 10000)) # Recent spans kept for export
+EXPORT_FILE = "timings.jsonl"
+
+# Log-spaced histogram buckets: 16 per decade from 1 µs to 100 s (~15% wide)
+BUCKETS_PER_DECADE = 16
+MIN_MS = 0.001
+N_BUCKETS = 8 * BUCKETS_PER_DECADE + 1
+
+_spans = deque(maxlen=RING_SIZE)
+_histograms = {} # name -> {"counts": [...], "count", "total_ms", "max_ms"}
+_event_counts = {} # name -> count
+_seq = 0 # Sequence number of the last span / event recorded
+_exported_seq = 0 # ... and of the last one export_jsonl wrote
+_lock = threading.Lock()
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+def _bucket(ms):
+    if ms <= MIN_MS: return 0
+    return min(int(math.log10(ms / MIN_MS) * BUCKETS_PER_DECADE) + 1, N_BUCKETS - 1)
+
+def _bucket_ms(i):
+    """Representative value (geometric middle) of bucket i."""
+    if i == 0: return MIN_MS
+    return MIN_MS * 10 ** ((i - 0.5) / BUCKETS_PER_DECADE)
+
+def _append(entry):
+    """Numbers the entry and adds it to the ring buffer (caller holds _lock)."""
+    global _seq
+    _seq += 1
+    _spans.append({"seq": _seq, **entry})
+
+def record(name, ms, **attrs):
+    """Adds one finished span of `name` taking `ms` milliseconds."""
+    if not ENABLED: return
+    with _lock:
+        _append({"name": name, "ts": time.time(), "ms": ms, **attrs})
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"counts": [0] * N_BUCKETS, "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        hist["counts"][_bucket(ms)] += 1
+        hist["count"] += 1
+        hist["total_ms"] += ms
+        if ms > hist["max_ms"]: hist["max_ms"] = ms
+
+def event(name, **attrs):
+    """Records something that happened (e.g. a fallback) without a duration."""
+    if not ENABLED: return
+    with _lock:
+        _append({"name": name, "ts": time.time(), "event": True, **attrs})
+        _event_counts[name] = _event_counts.get(name, 0) + 1
+
+@contextlib.contextmanager
+def _span(name, attrs):
+    t0 = time.perf_counter()
+    try:
+        yield attrs # Callers may add attributes while the span is open
+    finally:
+        record(name, (time.perf_counter() - t0) * 1000, **attrs)
+
+def span(name, **attrs):
+    """`with span("stage"):` times the block (also when it raises)."""
+    if not ENABLED: return contextlib.nullcontext({}) # Fresh dict: callers may write to it
+    return _span(name, attrs)
+
+def timed(name):
+    """Decorator form of span() for a whole function."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED: return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - t0) * 1000)
+        return wrapper
+    return decorate
+
+def _percentile(counts, total, q):
+    target = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= target and count: return _bucket_ms(i)
+    return 0.0
+
+def summary():
+    """Per span name: count, mean, p50, p95 and max in ms (p50/p95 from the histogram)."""
+    with _lock:
+        hists = {name: dict(h, counts=list(h["counts"])) for name, h in _histograms.items()}
+    rows = []
+    for name, h in sorted(hists.items()):
+        rows.append({
+            "name": name,
+            "count": h["count"],
+            "mean_ms": h["total_ms"] / h["count"],
+            # A bucket's middle can lie above the largest value seen in it
+            "p50_ms": min(_percentile(h["counts"], h["count"], 0.50), h["max_ms"]),
+            "p95_ms": min(_percentile(h["counts"], h["count"], 0.95), h["max_ms"]),
+            "max_ms": h["max_ms"],
+        })
+    return rows
+
+def event_counts():
+    """How often each event happened: {name: count}."""
+    with _lock:
+        return dict(sorted(_event_counts.items()))
+
+def recent_spans():
+    with _lock:
+        return list(_spans)
+
+def export_jsonl(path=None):
+    """
+    Appends the spans and events recorded since the last export (and still in
+    the ring buffer) to a JSON lines file. Returns how many were written.
+    """
+    global _exported_seq
+    with _lock:
+        spans = [s for s in _spans if s["seq"] > _exported_seq]
+    with open(path or EXPORT_FILE, "a", encoding="utf-8") as f:
+        for s in spans:
+            f.write(json.dumps(s, default=str) + "\n")
+    if spans: _exported_seq = spans[-1]["seq"]
+    return len(spans)
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _histograms.clear()
+        _event_counts.clear()
@@ -1,55 +1,214 @@
-import pandas as pd
+"""
+Offline evaluation of the whole pipeline: text -> predict_condition -> get_recommendations.
+
+    python test.py                                   # every row of drugs.csv as a query
+    python test.py --queries 200000 --jobs 4 --json eval.json
+
+Queries are the dataset's own description + side-effect texts with the
+condition name removed (the "blindfold" from train.py), labelled with their
+condition; --queries-file takes a CSV with 'text' and 'condition' columns instead.
+Predictions run in batches spread over a process pool (chunks of queries
+grouped by condition). Recommendations are then scored once per distinct
+(true, predicted) condition pair, so the metrics cost does not grow with the
+number of queries.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from modules import model
-
-# 1. Load Data
-df = model.load_data()
-print(f"Loaded Dataset: {len(df)} rows")
-
-# 2. Configuration
-# We define a "Correct Recommendation" as a drug with a Rating > 8.0
-# We defines a "Bad Recommendation" as a drug with a Rating < 6.0
-RATING_THRESHOLD = 8.0 
-TOP_K = 3  # We check the top 3 suggestions for every condition
-
-# 3. Get all unique conditions in the database
-all_conditions = df['medical_condition'].unique()
-print(f"Testing System across {len(all_conditions)} unique medical conditions...\n")
-
-total_recommendations = 0
-successful_recommendations = 0
-
-# 4. The Loop (Simulate a user asking about EVERY condition)
-for condition in all_conditions:
-    # Get Top 3 Recommendations using your model logic
-    recs = model.get_recommendations(condition, df, top_k=TOP_K)
-    
-    if not recs.empty:
-        for _, row in recs.iterrows():
-            total_recommendations += 1
-            
-            # Check if the recommended drug meets the quality standard
-            if row['rating'] >= RATING_THRESHOLD:
-                successful_recommendations += 1
-
-# 5. Calculate Final Score
-if total_recommendations > 0:
-    accuracy_score = (successful_recommendations / total_recommendations) * 100
-else:
-    accuracy_score = 0
-
-# 6. Print Report
-print("="*50)
-print("🎯 SYSTEM ACCURACY REPORT")
-print("="*50)
-print(f"Total Conditions Tested:   {len(all_conditions)}")
-print(f"Total Drugs Recommended:   {total_recommendations}")
-print(f"High Quality Recs (>8.0):  {successful_recommendations}")
-print("-" * 30)
-print(f"✅ SYSTEM RELIABILITY SCORE: {accuracy_score:.2f}%")
-print("="*50)
-
-# Explanation for your presentation
-print("\n📝 NOTE FOR PROJECT REPORT:")
-print(f"This metric (Precision@{TOP_K}) indicates that {accuracy_score:.1f}% of the time,")
-print("the top 3 drugs recommended by the AI have a user rating of 8.0/10 or higher.")
\ No newline at end of file
+import pandas as pd
+
+import train
+from modules import model, predictor, condition_matcher
+
+# A "Correct Recommendation" is a drug listed for the query's true condition
+# with a Rating >= 8.0 there; NDCG uses that rating (0 if not listed) as the gain
+RATING_THRESHOLD = 8.0
+TOP_K = 3    # We check the top 3 suggestions for every query
+TOP_N = 3    # Predictor top-N accuracy
+CHUNKS_PER_JOB = 4
+
+# -----------------------------------------------------------------------------
+# 1. QUERIES
+# -----------------------------------------------------------------------------
+def load_queries(df, path=None, size=None, seed=42):
+    """Frame with 'text' and 'condition' (the expected prediction)."""
+    if path:
+        queries = pd.read_csv(path)[['text', 'condition']].astype(str)
+    else:
+        raw = pd.DataFrame({
+            'medical_condition': df['medical_condition'].astype(str),
+            'medical_condition_description': df['medical_condition_description'].astype(str),
+            'side_effects': df['side_effects'].astype(str),
+        })
+        raw = train.add_training_text(raw)
+        queries = pd.DataFrame({'text': raw['training_text'], 'condition': raw['medical_condition']})
+    if size:
+        # More queries than rows: sample with replacement
+        queries = queries.sample(size, replace=size > len(queries), random_state=seed, ignore_index=True)
+    return queries
+
+# -----------------------------------------------------------------------------
+# 2. PREDICTION (process pool, batched)
+# -----------------------------------------------------------------------------
+def _predict_chunk(texts):
+    """Pipeline prediction (keywords + greeting guard included) + top-N ranking for one batch."""
+    predicted = np.asarray(predictor.predict_conditions(texts), dtype=object)
+    ranked = predictor.rank_conditions(texts, TOP_N)
+    if ranked is None: return predicted, None
+    # The SVM ranking with the pipeline's answer in front, so top-1 is the first column
+    top = [[p] + [c for c in row if c != p][:len(row) - 1] for p, row in zip(predicted, ranked)]
+    return predicted, np.array(top, dtype=object)
+
+def predict_all(queries, jobs=1):
+    """(predicted condition, top-N matrix or None) for every query, in query order."""
+    # Contiguous chunks of the condition-sorted queries: each worker sees few conditions
+    order = np.argsort(queries['condition'].to_numpy(), kind='stable')
+    chunks = [c for c in np.array_split(order, max(jobs, 1) * CHUNKS_PER_JOB) if len(c)]
+    texts = queries['text'].to_numpy()
+    batches = [texts[c].tolist() for c in chunks]
+
+    if jobs == 1:
+        results = [_predict_chunk(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_predict_chunk, batches))
+
+    predicted = np.empty(len(queries), dtype=object)
+    ranked = None if results[0][1] is None else np.empty((len(queries), results[0][1].shape[1]), dtype=object)
+    for chunk, (conditions, top) in zip(chunks, results):
+        predicted[chunk] = conditions
+        if ranked is not None: ranked[chunk] = top
+    return predicted, ranked
+
+# -----------------------------------------------------------------------------
+# 3. RANKING METRICS (one pass over distinct condition pairs)
+# -----------------------------------------------------------------------------
+def drug_ratings(df):
+    """Best rating of every (drug, condition) pair in the catalogue."""
+    frame = pd.DataFrame({'drug_name': df['drug_name'].astype(str),
+                          'condition': df['medical_condition'].astype(str),
+                          'rating': df['rating']})
+    return frame.groupby(['drug_name', 'condition'])['rating'].max()
+
+def ideal_dcg(ratings, k):
+    """DCG of the k best-rated drugs of each condition."""
+    best = ratings.reset_index().sort_values('rating', ascending=False, kind='stable')
+    best['pos'] = best.groupby('condition').cumcount()
+    best = best[best['pos'] < k]
+    return (best['rating'] / np.log2(best['pos'] + 2)).groupby(best['condition']).sum()
+
+def score_recommendations(true, predicted, df, k=TOP_K):
+    """
+    precision@k, NDCG@k and coverage of get_recommendations(predicted) judged
+    against the true conditions. Pass predicted=true to score the ranking alone.
+    """
+    pairs = pd.DataFrame({'true': true, 'predicted': predicted}).value_counts().rename('count').reset_index()
+
+    # Same rows as get_recommendations for each distinct predicted condition; the
+    # app shows no drugs for "General"
+    asked = [c for c in pairs['predicted'].unique() if c != "General"]
+    recs = model.get_recommendations_batch(asked, df, top_k=k)
+    if recs.empty: recs = pd.DataFrame(columns=['condition', 'rank', 'drug_name'])
+    recs = recs[['condition', 'rank', 'drug_name']].rename(columns={'condition': 'predicted'})
+    recs['drug_name'] = recs['drug_name'].astype(str)
+
+    # One row per (pair, recommended drug); gain = the drug's rating for the true condition
+    table = pairs.merge(recs, on='predicted', how='inner')
+    ratings = drug_ratings(df)
+    keys = pd.MultiIndex.from_arrays([table['drug_name'], table['true']])
+    gain = ratings.reindex(keys).fillna(0).to_numpy()
+    table['hit'] = gain >= RATING_THRESHOLD
+    table['dcg'] = gain / np.log2(table['rank'].to_numpy(dtype=float) + 1)
+    table['shown'] = 1
+    per_pair = table.groupby(['true', 'predicted'], sort=False)[['hit', 'dcg', 'shown']].sum()
+    per_pair = pairs.join(per_pair, on=['true', 'predicted']).fillna({'hit': 0, 'dcg': 0.0, 'shown': 0})
+
+    idcg = per_pair['true'].map(ideal_dcg(ratings, k)).fillna(0).to_numpy()
+    ndcg = np.divide(per_pair['dcg'].to_numpy(), idcg, out=np.zeros(len(per_pair)), where=idcg > 0)
+    weights = per_pair['count'].to_numpy()
+    shown = recs.loc[recs['predicted'].isin(set(pairs['predicted'])), 'drug_name']
+    return {
+        f"precision@{k}": float(np.average(per_pair['hit'].to_numpy() / k, weights=weights)),
+        f"ndcg@{k}": float(np.average(ndcg, weights=weights)),
+        "coverage": shown.nunique() / max(df['drug_name'].nunique(), 1),
+        "drugs_per_query": float(np.average(per_pair['shown'].to_numpy(), weights=weights)),
+    }
+
+# -----------------------------------------------------------------------------
+# 4. REPORT
+# -----------------------------------------------------------------------------
+def evaluate(df, queries, jobs=1, k=TOP_K):
+    true = queries['condition'].to_numpy(dtype=object)
+    t0 = time.perf_counter()
+    predicted, ranked = predict_all(queries, jobs)
+    t1 = time.perf_counter()
+    pipeline = score_recommendations(true, predicted, df, k)
+    t2 = time.perf_counter()
+    oracle = score_recommendations(true, true, df, k)
+
+    report = {
+        "queries": len(queries),
+        "conditions": int(queries['condition'].nunique()),
+        "top1_accuracy": float(np.mean(predicted == true)),
+        f"top{TOP_N}_accuracy": None if ranked is None else float((ranked == true[:, None]).any(axis=1).mean()),
+        "pipeline": pipeline,
+        "true_condition": oracle,
+        "predict_s": t1 - t0,
+        "score_s": t2 - t1,
+        "queries_per_s": len(queries) / (t2 - t0),
+    }
+    return report
+
+def print_report(r, k=TOP_K):
+    print("=" * 60)
+    print("🎯 SYSTEM EVALUATION REPORT")
+    print("=" * 60)
+    print(f"Queries:                   {r['queries']:,} over {r['conditions']} conditions")
+    print(f"Predictor top-1 accuracy:  {r['top1_accuracy'] * 100:6.2f}%")
+    top_n = r[f'top{TOP_N}_accuracy']
+    print(f"Predictor top-{TOP_N} accuracy:  " + ("n/a (no models)" if top_n is None else f"{top_n * 100:6.2f}%"))
+    print("-" * 60)
+    print(f"{'Recommendations for':<26}{'P@' + str(k):>10}{'NDCG@' + str(k):>10}{'Coverage':>12}")
+    for label, key in [("predicted condition", "pipeline"), ("true condition", "true_condition")]:
+        m = r[key]
+        print(f"{label:<26}{m[f'precision@{k}'] * 100:9.2f}%{m[f'ndcg@{k}']:10.3f}{m['coverage'] * 100:11.2f}%")
+    print("-" * 60)
+    print(f"⏱️  Predict {r['predict_s']:.2f} s + score {r['score_s']:.2f} s = {r['queries_per_s']:,.0f} queries/s")
+    print("=" * 60)
+
+    # Explanation for your presentation
+    print("\n📝 NOTE FOR PROJECT REPORT:")
+    print(f"Precision@{k} is the share of the top {k} recommended drugs that are listed for the")
+    print(f"patient's actual condition with a user rating of {RATING_THRESHOLD}/10 or higher.")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="drugs.csv")
+    parser.add_argument("--queries", type=int, help="number of queries (sampled from the dataset)")
+    parser.add_argument("--queries-file", help="CSV with 'text' and 'condition' columns")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="prediction processes")
+    parser.add_argument("--k", type=int, default=TOP_K, help="recommendations judged per query")
+    parser.add_argument("--json", help="write the metrics to this file")
+    args = parser.parse_args()
+
+    df = model.load_data(args.data)
+    condition_matcher.DRUGS_FILE = args.data
+    condition_matcher.load() # Before the pool, so forked workers inherit it
+    print(f"Loaded Dataset: {len(df)} rows")
+    if not predictor.warm_up(): print("⚠️  No predictor models found: every query is predicted as General.")
+    queries = load_queries(df, args.queries_file, args.queries)
+    print(f"Testing System with {len(queries):,} queries ({args.jobs} processes)...\n")
+
+    report = evaluate(df, queries, args.jobs, args.k)
+    print_report(report, args.k)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📝 Metrics written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,331 @@
 import pandas as pd
+import numpy as np
+import argparse
+import json
 import os
-import joblib
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
+import subprocess
+import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from modules import predictor
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.svm import LinearSVC
-from sklearn.model_selection import train_test_split
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
 from sklearn.metrics import accuracy_score
 
+try:
+    import resource
+except ImportError: # Windows: peak memory is reported as n/a
+    resource = None
+
+try:
+    import pyarrow  # Enables the cache of blindfolded training text
+except ImportError:
+    pyarrow = None
+
 # -----------------------------------------------------------------------------
 # CONFIGURATION
 # -----------------------------------------------------------------------------
 DATA_FILE = "drugs.csv"
 MODELS_DIR = "models"
-SVM_PATH = os.path.join(MODELS_DIR, "svm_condition.joblib")
-VEC_PATH = os.path.join(MODELS_DIR, "tfidf_condition.joblib")
+PIPELINE_PATH = os.path.join(MODELS_DIR, "condition_pipeline.joblib")
+
+TEXT_COLS = ['medical_condition', 'medical_condition_description', 'side_effects']
+
+# Blindfolded text is cached per input-data hash; bump the version if blindfold() changes
+CACHE_DIR = "cache"
+BLINDFOLD_VERSION = "1"
+
+# Streaming mode: rows per chunk and size of the hashed feature space
+CHUNK_ROWS = 50_000
+HASH_FEATURES = 2 ** 16 # Model size: n_classes x HASH_FEATURES float64 weights
+HOLDOUT_EVERY = 5 # Every 5th row is held out for evaluation (20%, like the standard split)
 
-if not os.path.exists(MODELS_DIR): os.makedirs(MODELS_DIR)
+# Parallel mode: candidates searched with cross-validation, all fits run in a process pool
+PARAM_GRID = {
+    "tfidf__max_features": [5000, 20000],
+    "svm__C": [0.5, 1.0, 2.0],
+}
 
 # -----------------------------------------------------------------------------
 # 1. LOAD DATA
 # -----------------------------------------------------------------------------
-print("⏳ Loading data...")
-df = pd.read_csv(DATA_FILE)
-df.columns = [c.lower().strip() for c in df.columns]
+def clean_frame(df):
+    df.columns = [c.lower().strip() for c in df.columns]
 
-# Clean NaNs
-text_cols = ['medical_condition', 'medical_condition_description', 'side_effects']
-for col in text_cols:
-    if col in df.columns:
-        df[col] = df[col].astype(str).fillna("")
+    # Clean NaNs
+    for col in TEXT_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).fillna("")
+    return df
+
+def load_training_data(path):
+    print("⏳ Loading data...")
+    return clean_frame(pd.read_csv(path))
 
 # -----------------------------------------------------------------------------
 # 2. THE "REALISTIC" FIX (BLINDFOLDING)
 # -----------------------------------------------------------------------------
-print("\n🙈 Applying 'Blindfold' (Removing disease names from text)...")
-
-def clean_training_text(row):
-    # Combine description and side effects
-    text = row['medical_condition_description'] + " " + row['side_effects']
-    condition = row['medical_condition']
-    
+def _blindfold_group(condition, texts):
     # Remove the condition name from the text (Case Insensitive)
     # e.g. Remove "Acne" from "Acne is a skin disease" -> " is a skin disease"
-    if len(condition) > 3: # Only remove if it's a significant word
-        text = re.sub(r'\b' + re.escape(condition) + r'\b', '', text, flags=re.IGNORECASE)
-    
-    return text
+    if len(condition) <= 3: return texts # Only remove if it's a significant word
+    pattern = re.compile(r'\b' + re.escape(condition) + r'\b', flags=re.IGNORECASE)
+    return texts.str.replace(pattern, '', regex=True)
+
+def blindfold(df, jobs=1):
+    """
+    Description + side effects with the row's own condition name removed.
+    Rows are grouped by condition, so each pattern is compiled once and applied
+    to the whole group in one str.replace; jobs > 1 spreads groups over processes.
+    """
+    # Combine description and side effects
+    texts = df['medical_condition_description'] + " " + df['side_effects']
+    groups = df.groupby('medical_condition', sort=False).indices
 
-# Apply the cleaning
-df['training_text'] = df.apply(clean_training_text, axis=1)
+    if jobs == 1 or len(groups) < 2:
+        parts = [_blindfold_group(condition, texts.iloc[pos]) for condition, pos in groups.items()]
+    else:
+        with ProcessPoolExecutor(max_workers=None if jobs < 0 else jobs) as pool:
+            parts = list(pool.map(_blindfold_group, groups, [texts.iloc[pos] for pos in groups.values()]))
 
-X = df['training_text']
-y = df['medical_condition']
+    # Scatter the groups back to their original row positions
+    out = texts.to_numpy(dtype=object).copy()
+    for pos, part in zip(groups.values(), parts):
+        out[pos] = part.to_numpy(dtype=object)
+    return pd.Series(out, index=texts.index)
+
+def _data_hash(df):
+    cols = ['medical_condition', 'medical_condition_description', 'side_effects']
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(BLINDFOLD_VERSION.encode())
+    digest.update(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def add_training_text(df, jobs=1, use_cache=True):
+    """Adds 'training_text', reusing the cached result for identical input data."""
+    cache_path = None
+    if use_cache and pyarrow is not None:
+        cache_path = os.path.join(CACHE_DIR, f"training_text-{_data_hash(df)}.parquet")
+        if os.path.exists(cache_path):
+            print("♻️  Reusing cached blindfolded text")
+            df['training_text'] = pd.read_parquet(cache_path)['training_text'].to_numpy()
+            return df
+
+    # Apply the cleaning
+    df['training_text'] = blindfold(df, jobs)
+
+    if cache_path:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df[['training_text']].to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    return df
 
 # -----------------------------------------------------------------------------
-# 3. EVALUATE REALISTIC ACCURACY
+# 3. TRAINING MODES
 # -----------------------------------------------------------------------------
-print("🧠 Training on sanitized data...")
+def train_standard(path, save=True, prep_jobs=1):
+    """The original pipeline: in-memory TF-IDF + LinearSVC on a single core."""
+    df = load_training_data(path)
+
+    print("\n🙈 Applying 'Blindfold' (Removing disease names from text)...")
+    df = add_training_text(df, jobs=prep_jobs)
+
+    X = df['training_text']
+    y = df['medical_condition']
+
+    # --- EVALUATE REALISTIC ACCURACY ---
+    print("🧠 Training on sanitized data...")
+
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    X_vec = vectorizer.fit_transform(X)
+
+    X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42)
 
-vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
-X_vec = vectorizer.fit_transform(X)
+    model = LinearSVC(random_state=42, class_weight='balanced')
+    model.fit(X_train, y_train)
 
-X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42)
+    preds = model.predict(X_test)
+    acc = accuracy_score(y_test, preds) * 100
 
-model = LinearSVC(random_state=42, class_weight='balanced')
-model.fit(X_train, y_train)
+    print("-" * 40)
+    print(f"🎯 REALISTIC ACCURACY: {acc:.2f}%")
+    print("-" * 40)
 
-preds = model.predict(X_test)
-acc = accuracy_score(y_test, preds) * 100
+    # --- SAVE ---
+    if save:
+        print("\n💾 Retraining on full realistic data and saving...")
+        final_model = LinearSVC(random_state=42, class_weight='balanced')
+        final_model.fit(X_vec, y)
+        save_models(vectorizer, final_model)
 
-print("-" * 40)
-print(f"🎯 REALISTIC ACCURACY: {acc:.2f}%")
-print("-" * 40)
+    return acc
+
+def _read_chunks(path, **kwargs):
+    for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, **kwargs):
+        yield clean_frame(chunk)
+
+def train_streaming(path, save=False, epochs=1):
+    """
+    Out-of-core: reads the data in chunks and never holds more than one chunk.
+    HashingVectorizer needs no fitted vocabulary, and SGDClassifier learns
+    incrementally with partial_fit (hinge loss = linear SVM).
+    """
+    # Pass 1: only the label column, for the class list and 'balanced' weights
+    print("⏳ Counting classes...")
+    counts = pd.Series(dtype='int64')
+    for chunk in _read_chunks(path, usecols=lambda c: c.lower().strip() == 'medical_condition'):
+        counts = counts.add(chunk['medical_condition'].value_counts(), fill_value=0)
+    classes = np.array(sorted(counts.index))
+    class_weight = counts.sum() / (len(classes) * counts)
+
+    vectorizer = HashingVectorizer(stop_words='english', n_features=HASH_FEATURES, alternate_sign=False)
+    model = SGDClassifier(loss='hinge', random_state=42)
+
+    def labelled_chunks():
+        offset = 0
+        for chunk in _read_chunks(path):
+            holdout = (np.arange(offset, offset + len(chunk)) % HOLDOUT_EVERY) == 0
+            offset += len(chunk)
+            yield add_training_text(chunk, use_cache=False), holdout
+
+    print("🧠 Training on sanitized data (streaming)...")
+    for epoch in range(epochs):
+        for chunk, holdout in labelled_chunks():
+            train = chunk[~holdout]
+            if train.empty: continue
+            y = train['medical_condition'].to_numpy()
+            model.partial_fit(vectorizer.transform(train['training_text']), y,
+                              classes=classes, sample_weight=class_weight.loc[y].to_numpy())
+
+    correct = total = 0
+    for chunk, holdout in labelled_chunks():
+        test = chunk[holdout]
+        if test.empty: continue
+        preds = model.predict(vectorizer.transform(test['training_text']))
+        correct += int((preds == test['medical_condition'].to_numpy()).sum())
+        total += len(test)
+    acc = correct / total * 100 if total else 0.0
+
+    print("-" * 40)
+    print(f"🎯 STREAMING ACCURACY: {acc:.2f}%")
+    print("-" * 40)
+
+    if save: save_models(vectorizer, model)
+    return acc
+
+def train_parallel(path, save=False, jobs=-1, folds=5, prep_jobs=1):
+    """
+    Hyperparameter search: every (candidate, CV fold) fit runs in a process pool
+    (GridSearchCV n_jobs). The best candidate is scored on the same 20% holdout.
+    """
+    df = add_training_text(load_training_data(path), jobs=prep_jobs)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df['training_text'], df['medical_condition'], test_size=0.2, random_state=42)
+
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer(stop_words='english')),
+        ("svm", LinearSVC(random_state=42, class_weight='balanced')),
+    ])
+    n_fits = folds * int(np.prod([len(v) for v in PARAM_GRID.values()]))
+    print(f"🧠 Searching {n_fits} fits in parallel (n_jobs={jobs})...")
+
+    # Folds are made from the training part only; rare classes may have < folds samples
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    search = GridSearchCV(pipeline, PARAM_GRID, cv=cv, n_jobs=jobs, refit=True)
+    search.fit(X_train, y_train)
+
+    acc = accuracy_score(y_test, search.predict(X_test)) * 100
+    print("-" * 40)
+    print(f"🏆 Best params: {search.best_params_} (CV {search.best_score_ * 100:.2f}%)")
+    print(f"🎯 HOLDOUT ACCURACY: {acc:.2f}%")
+    print("-" * 40)
+
+    if save:
+        best = search.best_estimator_
+        best.fit(df['training_text'], df['medical_condition'])
+        save_models(best.named_steps["tfidf"], best.named_steps["svm"])
+    return acc
+
+def save_models(vectorizer, model):
+    if not os.path.exists(MODELS_DIR): os.makedirs(MODELS_DIR)
+    # One versioned file; the predictor memory-maps its arrays
+    predictor.save_pipeline(vectorizer, model, PIPELINE_PATH)
+    print("✅ Models Saved.")
 
 # -----------------------------------------------------------------------------
-# 4. SAVE
+# 4. REPORTING
 # -----------------------------------------------------------------------------
-print("\n💾 Retraining on full realistic data and saving...")
-final_model = LinearSVC(random_state=42, class_weight='balanced')
-final_model.fit(X_vec, y)
+def peak_memory_mb():
+    """Peak RSS of this process and of its largest child (pool workers), in MB."""
+    if resource is None: return None
+    # RUSAGE_CHILDREN only covers children that have exited and been waited for:
+    # stop joblib's reusable worker pool (GridSearchCV n_jobs) before reading it
+    from joblib.externals.loky import get_reusable_executor
+    get_reusable_executor().shutdown(wait=True)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return usage * scale / 2 ** 20
+
+def compare(path, jobs, prep_jobs):
+    """Runs every mode in a fresh process, so wall time and peak memory are not shared."""
+    rows = []
+    for mode in ["standard", "streaming", "parallel"]:
+        print(f"\n▶️  Running mode: {mode}")
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--data", path,
+             "--jobs", str(jobs), "--prep-jobs", str(prep_jobs), "--no-save", "--json"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    print("\n" + "=" * 60)
+    print(f"{'Mode':<12}{'Wall time':>14}{'Peak memory':>16}{'Accuracy':>14}")
+    print("-" * 60)
+    for r in rows:
+        mem = f"{r['peak_mb']:.0f} MB" if r['peak_mb'] is not None else "n/a"
+        print(f"{r['mode']:<12}{r['wall_s']:>12.1f} s{mem:>16}{r['accuracy']:>13.2f}%")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the symptom -> condition classifier.")
+    parser.add_argument("--mode", choices=["standard", "streaming", "parallel", "compare"], default="standard")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--jobs", type=int, default=-1, help="worker processes for parallel mode (-1 = all cores)")
+    parser.add_argument("--epochs", type=int, default=1, help="passes over the data in streaming mode")
+    parser.add_argument("--prep-jobs", type=int, default=1, help="processes for blindfolding (-1 = all cores)")
+    parser.add_argument("--save", action="store_true", help="also save the model (default only for standard mode)")
+    parser.add_argument("--no-save", action="store_true", help="never save the model")
+    parser.add_argument("--json", action="store_true", help="print the run summary as one JSON line")
+    args = parser.parse_args()
+
+    if args.mode == "compare":
+        compare(args.data, args.jobs, args.prep_jobs)
+        return
+
+    save = not args.no_save and (args.save or args.mode == "standard")
+    start = time.perf_counter()
+    if args.mode == "standard":
+        acc = train_standard(args.data, save=save, prep_jobs=args.prep_jobs)
+    elif args.mode == "streaming":
+        acc = train_streaming(args.data, save=save, epochs=args.epochs)
+    else:
+        acc = train_parallel(args.data, save=save, jobs=args.jobs, prep_jobs=args.prep_jobs)
+    wall = time.perf_counter() - start
 
-joblib.dump(final_model, SVM_PATH)
-joblib.dump(vectorizer, VEC_PATH)
+    summary = {"mode": args.mode, "wall_s": wall, "peak_mb": peak_memory_mb(), "accuracy": acc}
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        mem = f"{summary['peak_mb']:.0f} MB" if summary['peak_mb'] is not None else "n/a"
+        print(f"\n⏱️  Wall time: {wall:.1f} s   📈 Peak memory: {mem}")
 
-print("✅ Models Saved.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()